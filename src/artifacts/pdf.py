@@ -1,20 +1,44 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional, List
-
-import PyPDF2
+from typing import Iterator, Optional, List, Set, Tuple
 
+from artifacts.pdf_backends import PdfBackend, PdfBackendType, create_backend
 from config import ConfigManager
+from utils.tracing import Tracer, traced
 from utils.validator import validate_args
 
 
+def _extract_page_range(backend: str, pdf_path: Path, page_nums: List[int]) -> List[str]:
+    # Runs in a worker process, so it opens its own document
+    pdf_backend = create_backend(backend, pdf_path)
+    try:
+        return [pdf_backend.extract_page(page_num) for page_num in page_nums]
+    finally:
+        pdf_backend.close()
+
+
 class Pdf:
     PAGE_SEPARATOR = "\n\n---\n\n"
+    MIN_PAGES_PER_TASK = 8
 
     @validate_args({"pdf_path": Path})
-    def __init__(self, pdf_path: Path):
+    def __init__(self, pdf_path: Path, backend: PdfBackendType | str = PdfBackendType.PYMUPDF,
+                 workers: int = 1, lazy: bool = False):
+        """
+        :param backend: text extraction library, PyMuPDF is by far the fastest
+        :param workers: number of processes used by get_text, 0 means one per CPU
+        :param lazy: extract pages on demand in get_page_text instead of requiring get_text first
+        """
         self.pdf_path = pdf_path
+        self.backend_type = PdfBackendType(backend)
+        self.workers = workers
+        self.lazy = lazy
         self.text: str = ""
         self.pages: List[str] = []
+        self._extracted: Set[int] = set()
+        self._backend: Optional[PdfBackend] = None
         self._validate_pdf()
 
     def _validate_pdf(self) -> None:
@@ -23,24 +47,86 @@ class Pdf:
         if self.pdf_path.suffix.lower() != '.pdf':
             raise ValueError(f"File {self.pdf_path} is not a PDF")
 
-    def get_text(self, pages: Optional[List[int]] = None) -> str:
+    @property
+    def backend(self) -> PdfBackend:
+        if self._backend is None:
+            self._backend = create_backend(self.backend_type, self.pdf_path)
+            self.pages = [""] * self._backend.page_count()
+            self._extracted = set()
+        return self._backend
+
+    @property
+    def page_count(self) -> int:
+        return self.backend.page_count()
+
+    @traced("pdf.get_text")
+    def get_text(self, pages: Optional[List[int]] = None, workers: Optional[int] = None) -> str:
         try:
-            with open(self.pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                total_pages = len(pdf_reader.pages)
-                pages_to_process = [p-1 for p in pages if 0 < p <= total_pages] if pages else range(total_pages)
-                self.pages = [""] * total_pages
-                for page_num in pages_to_process:
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    self.pages[page_num] = page_text
-                self.text = Pdf.PAGE_SEPARATOR.join(self.pages)
-                return self.text.strip()
+            total_pages = self.page_count
+            requested = [p-1 for p in pages if 0 < p <= total_pages] if pages else range(total_pages)
+            # Pages extracted earlier (e.g. lazily) are memoized and not extracted again
+            pages_to_process = [p for p in requested if p not in self._extracted]
+            workers = self.workers if workers is None else workers
+            workers = workers or os.cpu_count() or 1
+            if workers > 1 and len(pages_to_process) > Pdf.MIN_PAGES_PER_TASK:
+                page_texts = self._extract_parallel(pages_to_process, workers)
+            else:
+                page_texts = [self.backend.extract_page(page_num) for page_num in pages_to_process]
+            for page_num, page_text in zip(pages_to_process, page_texts):
+                self.pages[page_num] = page_text
+            self._extracted.update(pages_to_process)
+            Tracer().count("pdf.pages_extracted", len(pages_to_process))
+            requested = set(requested)
+            self.text = Pdf.PAGE_SEPARATOR.join(page_text if page_num in requested else ""
+                                                for page_num, page_text in enumerate(self.pages))
+            return self.text.strip()
         except Exception as e:
             raise Exception(f"Unexpected error while processing PDF: {str(e)}")
 
+    def _extract_parallel(self, page_nums: List[int], workers: int) -> List[str]:
+        # Contiguous page ranges, a few per worker so that slow pages do not stall one process
+        task_size = max(Pdf.MIN_PAGES_PER_TASK, -(-len(page_nums) // (workers * 4)))
+        tasks = [page_nums[i:i + task_size] for i in range(0, len(page_nums), task_size)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            # map preserves task order, so the pages come back in document order
+            results = executor.map(_extract_page_range, [self.backend_type.value] * len(tasks),
+                                   [self.pdf_path] * len(tasks), tasks)
+            return [page_text for task_texts in results for page_text in task_texts]
+
+    def iter_pages(self, memoize: bool = True) -> Iterator[Tuple[int, str]]:
+        """
+        Yields (page number, text) one page at a time, starting at page 1.
+        With memoize=False the extracted text is not kept on the instance.
+        """
+        for page_num in range(self.page_count):
+            if page_num in self._extracted:
+                page_text = self.pages[page_num]
+            else:
+                page_text = self.backend.extract_page(page_num)
+                if memoize:
+                    self.pages[page_num] = page_text
+                    self._extracted.add(page_num)
+            yield page_num + 1, page_text
+
+    @staticmethod
+    def hash_page(page_text: str) -> str:
+        return hashlib.sha1(page_text.encode('utf-8')).hexdigest()
+
+    @property
+    def page_hashes(self) -> List[str]:
+        """
+        Content hash of every page, in page order. Pages that were not extracted hash as empty.
+        """
+        return [Pdf.hash_page(page_text) for page_text in self.pages]
+
     def get_page_text(self, page_num: int) -> str:
-        if not 0 <= page_num - 1 < len(self.pages) or not self.pages[page_num - 1]:
+        if self.lazy and 0 < page_num <= self.page_count:
+            if page_num - 1 not in self._extracted:
+                self.pages[page_num - 1] = self.backend.extract_page(page_num - 1)
+                self._extracted.add(page_num - 1)
+            return self.pages[page_num - 1]
+        # An extracted page may legitimately be empty, so membership decides, not the text
+        if page_num - 1 not in self._extracted:
             raise ValueError(f"Page {page_num} not found. Either invalid page number or page not yet extracted")
         return self.pages[page_num - 1]
 
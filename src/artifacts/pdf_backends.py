@@ -0,0 +1,89 @@
+from abc import ABC, abstractmethod
+from enum import Enum
+from pathlib import Path
+
+from utils.lazy_import import lazy_import
+
+# Only the backend in use is ever imported
+pymupdf = lazy_import("pymupdf")
+pypdf = lazy_import("pypdf")
+PyPDF2 = lazy_import("PyPDF2")
+
+
+class PdfBackendType(Enum):
+    PYMUPDF = "pymupdf"
+    PYPDF = "pypdf"
+    PYPDF2 = "PyPDF2"
+
+
+class PdfBackend(ABC):
+    """
+    Text extraction from a single PDF. Page numbers are 0-based.
+    """
+
+    def __init__(self, pdf_path: Path):
+        self.pdf_path = pdf_path
+
+    @abstractmethod
+    def page_count(self) -> int:
+        pass
+
+    @abstractmethod
+    def extract_page(self, page_num: int) -> str:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class PyMuPdfBackend(PdfBackend):
+
+    def __init__(self, pdf_path: Path):
+        super().__init__(pdf_path)
+        self.document = pymupdf.open(str(pdf_path))
+
+    def page_count(self) -> int:
+        return self.document.page_count
+
+    def extract_page(self, page_num: int) -> str:
+        return self.document.load_page(page_num).get_text()
+
+    def close(self) -> None:
+        self.document.close()
+
+
+class PypdfBackend(PdfBackend):
+
+    def __init__(self, pdf_path: Path):
+        super().__init__(pdf_path)
+        self.reader = pypdf.PdfReader(str(pdf_path))
+
+    def page_count(self) -> int:
+        return len(self.reader.pages)
+
+    def extract_page(self, page_num: int) -> str:
+        return self.reader.pages[page_num].extract_text()
+
+
+class PyPdf2Backend(PdfBackend):
+
+    def __init__(self, pdf_path: Path):
+        super().__init__(pdf_path)
+        self.reader = PyPDF2.PdfReader(str(pdf_path))
+
+    def page_count(self) -> int:
+        return len(self.reader.pages)
+
+    def extract_page(self, page_num: int) -> str:
+        return self.reader.pages[page_num].extract_text()
+
+
+BACKENDS = {
+    PdfBackendType.PYMUPDF: PyMuPdfBackend,
+    PdfBackendType.PYPDF: PypdfBackend,
+    PdfBackendType.PYPDF2: PyPdf2Backend,
+}
+
+
+def create_backend(backend: PdfBackendType | str, pdf_path: Path) -> PdfBackend:
+    return BACKENDS[PdfBackendType(backend)](pdf_path)
@@ -0,0 +1,88 @@
+"""
+Recall/latency/memory comparison of the FAISS index types FaissRetriever can build.
+
+Exact search with IndexFlatL2 is the ground truth; every other index type is scored by recall@k
+against it. Run from the ``src`` directory:
+
+    python -m benchmarks.ann_benchmark --num-vectors 200000 --dim 384 --k 5
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from retrievers.index_factory import IndexType, build_index, index_memory_bytes
+
+
+def synthetic_embeddings(num_vectors: int, dim: int, num_clusters: int = 256, seed: int = 42) -> np.ndarray:
+    # Clustered data resembles sentence embeddings far better than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_clusters, dim)).astype('float32')
+    assignments = rng.integers(0, num_clusters, size=num_vectors)
+    return centers[assignments] + 0.3 * rng.normal(size=(num_vectors, dim)).astype('float32')
+
+
+def recall_at_k(ground_truth: np.ndarray, found: np.ndarray) -> float:
+    k = ground_truth.shape[1]
+    hits = sum(len(set(truth) & set(result)) for truth, result in zip(ground_truth, found))
+    return hits / (len(ground_truth) * k)
+
+
+def benchmark(embeddings: np.ndarray, queries: np.ndarray, k: int, index_types: List[IndexType],
+              nprobe: int, ef_search: int) -> List[Dict]:
+    flat = build_index(embeddings, IndexType.FLAT)
+    _, ground_truth = flat.search(queries, k)
+
+    results = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_index(embeddings, index_type, nprobe=nprobe, ef_search=ef_search)
+        build_seconds = time.perf_counter() - start
+
+        latencies = []
+        found = np.empty((len(queries), k), dtype='int64')
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, indices = index.search(query[None, :], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[i] = indices[0]
+
+        results.append({
+            "index_type": index_type.value,
+            "build_seconds": round(build_seconds, 3),
+            f"recall@{k}": round(recall_at_k(ground_truth, found), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 4),
+            "memory_bytes": index_memory_bytes(index),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num-vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--index-types", nargs="+", default=[t.value for t in IndexType if t != IndexType.AUTO])
+    parser.add_argument("--output", type=str, default=None, help="Optional path for the JSON results")
+    args = parser.parse_args()
+
+    data = synthetic_embeddings(args.num_vectors + args.queries, args.dim)
+    embeddings, queries = data[:args.num_vectors], data[args.num_vectors:]
+    results = benchmark(embeddings, queries, args.k, [IndexType(t) for t in args.index_types],
+                        args.nprobe, args.ef_search)
+
+    report = json.dumps({"num_vectors": args.num_vectors, "dim": args.dim, "k": args.k, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Aggregate generation throughput of LocalRagChat.generate_batch against the batch size.
+
+Prompts are built from real retrieval results on a PDF so that their lengths vary the way they
+do in use. Every batch size generates the same prompts with greedy decoding and a fixed number
+of new tokens. Run from the ``src`` directory:
+
+    python -m benchmarks.batch_generation_benchmark --num-prompts 32 --batch-sizes 1 4 8 16
+"""
+import argparse
+import json
+from pathlib import Path
+
+from artifacts.pdf import Pdf
+from chat.local_rag_chat import LocalRagChat
+from config import ConfigManager
+from retrievers.faiss_retriever import FaissRetriever
+from retrievers.index_cache import IndexCache
+
+QUESTIONS = [
+    "What is the geographical distribution of revenue?",
+    "How did operating income change compared to the previous year?",
+    "What are the main risks mentioned in the report?",
+    "Who are the members of the board?",
+    "What is the dividend policy?",
+    "How much was spent on research and development?",
+    "What were the largest acquisitions?",
+    "How is the company financed?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", type=Path, default=ConfigManager().pdf_file_path)
+    parser.add_argument("--model", type=str, default=ConfigManager().local_llm)
+    parser.add_argument("--device", type=str, default=None)
+    parser.add_argument("--num-prompts", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--output", type=str, default=None, help="Optional path for the JSON results")
+    args = parser.parse_args()
+
+    retriever = FaissRetriever(Pdf(args.pdf), cache=IndexCache())
+    chat = LocalRagChat(retriever, model_name=args.model, device=args.device)
+    chat.generation_kwargs = dict(max_new_tokens=args.new_tokens, min_new_tokens=args.new_tokens, do_sample=False)
+
+    queries = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.num_prompts)]
+    # Varying top_k varies the prompt lengths, as different questions would
+    prompts = [chat.prompt.format(CONTEXT="\n\n---\n\n".join(retriever.retrieve(query, top_k=1 + i % 5)),
+                                  QUERY=query)
+               for i, query in enumerate(queries)]
+    # Warm-up so that one-off kernel initialisation does not count against the first batch size
+    chat.generate_batch(prompts[:2], batch_size=2)
+
+    results = []
+    for batch_size in args.batch_sizes:
+        chat.generate_batch(prompts, batch_size=batch_size)
+        stats = chat.last_batch_stats
+        results.append({
+            "batch_size": batch_size,
+            "prompts": stats["prompts"],
+            "generated_tokens": stats["generated_tokens"],
+            "seconds": round(stats["seconds"], 2),
+            "tokens_per_second": round(stats["tokens_per_second"], 2),
+        })
+        print(results[-1])
+
+    report = json.dumps({"model": args.model, "device": chat.local_model.device, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Cold import time of the package's entry points, and a guard against heavy dependencies creeping
+back onto the import path.
+
+Every module is imported in a fresh interpreter. The run fails (exit code 1) if an import takes
+longer than ``--budget`` seconds (median of ``--repeat`` runs) or executes one of the heavy
+dependencies, which are only meant to load on first use. Run from the ``src`` directory:
+
+    python -m benchmarks.import_time_benchmark --budget 1.0
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+MODULES = [
+    "main",
+    "server",
+    "chat.rag_chat",
+    "chat.local_rag_chat",
+    "retrievers.faiss_retriever",
+    "retrievers.corpus_retriever",
+    "utils.rdf_utils",
+]
+
+HEAVY_MODULES = [
+    "torch", "transformers", "sentence_transformers", "faiss", "langchain_core", "langchain_openai",
+    "langchain_huggingface", "tiktoken", "streamlit", "matplotlib", "networkx", "rdflib",
+    "pymupdf", "pypdf", "PyPDF2",
+]
+
+# Lazily imported modules sit in sys.modules as _LazyModule until first used, so only count executed ones
+PROBE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules
+          and not isinstance(sys.modules[name], importlib.util._LazyModule)]
+print(json.dumps({{"seconds": seconds, "loaded": loaded}}))
+"""
+
+
+def measure(module: str, repeat: int) -> Dict:
+    runs, loaded = [], set()
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                 cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True)
+        if process.returncode != 0:
+            return {"module": module, "error": process.stderr.strip().splitlines()[-1]}
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        runs.append(result["seconds"])
+        loaded.update(result["loaded"])
+    return {"module": module, "median_seconds": round(statistics.median(runs), 4),
+            "max_seconds": round(max(runs), 4), "heavy_modules_loaded": sorted(loaded)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="Maximum median import time in seconds")
+    parser.add_argument("--output", type=str, default=None, help="Optional path for the JSON results")
+    args = parser.parse_args()
+
+    results: List[Dict] = [measure(module, args.repeat) for module in args.modules]
+    failures = []
+    for result in results:
+        if "error" in result:
+            failures.append(f"{result['module']}: import failed ({result['error']})")
+            continue
+        if result["median_seconds"] > args.budget:
+            failures.append(f"{result['module']}: {result['median_seconds']}s exceeds the {args.budget}s budget")
+        if result["heavy_modules_loaded"]:
+            failures.append(f"{result['module']}: imports {', '.join(result['heavy_modules_loaded'])} eagerly")
+
+    report = json.dumps({"budget_seconds": args.budget, "results": results, "failures": failures}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    print(report)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
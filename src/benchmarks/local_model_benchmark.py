@@ -0,0 +1,97 @@
+"""
+Load time, resident memory and generation speed of the local chat model per device/precision.
+
+Every configuration runs in a fresh process, so memory and load time are not shared between them.
+Run from the ``src`` directory:
+
+    python -m benchmarks.local_model_benchmark --new-tokens 64
+    python -m benchmarks.local_model_benchmark --configs cpu:fp32 cpu:int8
+"""
+import argparse
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from config import ConfigManager
+
+PROMPT = ("Answer the question based on this context:\n"
+          "Revenue grew 12% in Europe and 8% in North America, while Asia-Pacific declined 3%.\n\n"
+          "Question: What is the geographical distribution of revenue?\n\nAnswer:")
+
+
+def _rss_mb() -> float:
+    # Current resident set size from /proc, which unlike ru_maxrss is not a high-water mark
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _run_config(model_name: str, device: str, quantize: bool, new_tokens: int) -> Dict:
+    import torch
+    from chat.local_model import load_local_model
+
+    rss_before_mb = _rss_mb()
+    local_model = load_local_model(model_name, device, quantize=quantize)
+    rss_after_mb = _rss_mb()
+
+    inputs = local_model.tokenizer(PROMPT, return_tensors="pt").to(local_model.model.device)
+    with torch.inference_mode():
+        # Warm-up so that one-off kernel initialisation does not count against throughput
+        local_model.model.generate(**inputs, max_new_tokens=4, do_sample=False)
+        start = time.perf_counter()
+        output = local_model.model.generate(**inputs, max_new_tokens=new_tokens, min_new_tokens=new_tokens,
+                                            do_sample=False)
+        seconds = time.perf_counter() - start
+    generated = output.shape[1] - inputs["input_ids"].shape[1]
+    return {
+        "device": device,
+        "dtype": str(local_model.dtype).replace("torch.", ""),
+        "int8": quantize,
+        "load_seconds": round(local_model.load_seconds, 2),
+        "rss_mb": round(rss_after_mb, 1),
+        "model_rss_mb": round(rss_after_mb - rss_before_mb, 1),
+        "generated_tokens": int(generated),
+        "tokens_per_second": round(generated / seconds, 2),
+    }
+
+
+def _parse_config(config: str) -> Dict[str, Optional[object]]:
+    device, _, precision = config.partition(":")
+    return {"device": device, "quantize": precision == "int8"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", type=str, default=ConfigManager().local_llm)
+    parser.add_argument("--configs", nargs="+", default=None,
+                        help="device:precision pairs, e.g. cpu:fp32 cpu:int8 cuda:auto. "
+                             "Defaults to both cpu variants plus the detected accelerator.")
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--output", type=str, default=None, help="Optional path for the JSON results")
+    args = parser.parse_args()
+
+    configs = args.configs
+    if configs is None:
+        from chat.local_model import select_device
+        configs = ["cpu:fp32", "cpu:int8"] + ([f"{select_device()}:auto"] if select_device() != "cpu" else [])
+
+    results = []
+    for config in configs:
+        spawn = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+            results.append(executor.submit(_run_config, args.model, new_tokens=args.new_tokens,
+                                           **_parse_config(config)).result())
+
+    report = json.dumps({"model": args.model, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Pages/second and peak memory of every Pdf extraction backend on the PDFs in ``resources/``.
+
+Each backend runs in a fresh process so that peak RSS is not inflated by the backends measured
+before it. Throughput is timed after a warm-up and without tracemalloc; the Python heap peak comes
+from a separate pass under tracemalloc. Run from the ``src`` directory:
+
+    python -m benchmarks.pdf_backend_benchmark --repeat 3
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from artifacts.pdf import Pdf
+from artifacts.pdf_backends import PdfBackendType
+from config import ConfigManager
+from utils.file_system import list_files
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _extract_all(backend: str, pdf_paths: List[Path]) -> Tuple[int, int]:
+    pages = characters = 0
+    for pdf_path in pdf_paths:
+        pdf = Pdf(pdf_path, backend=backend)
+        characters += len(pdf.get_text())
+        pages += pdf.page_count
+    return pages, characters
+
+
+def _run_backend(backend: str, pdf_paths: List[Path], repeat: int) -> Dict:
+    # Warm-up: the backend is imported lazily on first use, which must not count as extraction time
+    Pdf(pdf_paths[0], backend=backend).get_text(pages=[1])
+    baseline_rss_mb = _peak_rss_mb()
+
+    # Throughput without tracemalloc, which slows pure-Python backends down by an order of magnitude
+    pages = characters = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run_pages, characters = _extract_all(backend, pdf_paths)
+        pages += run_pages
+    seconds = time.perf_counter() - start
+    peak_rss_mb = _peak_rss_mb()
+
+    # Python heap peak in a separate, untimed pass
+    tracemalloc.start()
+    _extract_all(backend, pdf_paths)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "backend": backend,
+        "pages": pages,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(pages / seconds, 1) if seconds else None,
+        "characters": characters,
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "peak_rss_increase_mb": round(peak_rss_mb - baseline_rss_mb, 1),
+        "python_heap_peak_mb": round(python_peak / 1024 ** 2, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--directory", type=str, default=str(ConfigManager().resources_path))
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--backends", nargs="+", default=[b.value for b in PdfBackendType])
+    parser.add_argument("--output", type=str, default=None, help="Optional path for the JSON results")
+    args = parser.parse_args()
+
+    pdf_paths = sorted(f for f in list_files(args.directory) if f.suffix.lower() == '.pdf')
+    results = []
+    for backend in args.backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results.append(executor.submit(_run_backend, backend, pdf_paths, args.repeat).result())
+
+    report = json.dumps({"pdfs": [p.name for p in pdf_paths], "results": results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
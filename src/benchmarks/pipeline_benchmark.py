@@ -0,0 +1,200 @@
+"""
+End-to-end timings of the RAG pipeline on synthetic PDFs, for comparing runs.
+
+For every requested document size a PDF is generated with PyMuPDF, then each stage is timed the way
+FaissRetriever runs it: Pdf.get_text, per-page chunking with the retriever's TokenChunker (and
+FaissRetriever.chunk_text over the whole text for comparison), embedding, building the FAISS index,
+then building a whole FaissRetriever, retrieve and RagChat.ask with a stub LLM. Everything runs
+offline on CPU: by default the embedding model is a deterministic hashing encoder, ``--encoder``
+accepts a locally available sentence-transformers model instead. Run from the ``src`` directory:
+
+    python -m benchmarks.pipeline_benchmark --pages 10 100 --output pipeline.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from artifacts.pdf import Pdf
+from chat.context_builder import ContextBuilder
+from chat.rag_chat import RagChat
+from retrievers.faiss_retriever import FaissRetriever, register_embedding_model
+from retrievers.index_factory import IndexType, build_index
+
+FAKE_ENCODER = "hashing-encoder"
+
+VOCABULARY = ("revenue income margin segment region europe asia america growth decline dividend board "
+              "director risk liquidity capital expenditure acquisition subsidiary debt loan covenant interest "
+              "tax provision goodwill impairment inventory receivable payable cash flow operating financing "
+              "investing equity share quarter annual audited statement consolidated").split()
+
+QUERIES = [
+    "What is the geographical distribution of revenue?",
+    "How did operating margin develop per segment?",
+    "Which covenants apply to the loans payable?",
+    "What dividend did the board propose?",
+    "How much goodwill impairment was recognised?",
+    "What are the main liquidity risks?",
+    "How large were capital expenditures in the quarter?",
+    "Which acquisitions were completed during the year?",
+]
+
+
+class _RegexTokenizer:
+    # Word and punctuation tokens with character offsets, like a fast HuggingFace tokenizer
+    is_fast = True
+    _token = re.compile(r"\w+|[^\w\s]")
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False, **kwargs):
+        offsets = [(match.start(), match.end()) for match in self._token.finditer(text)]
+        encoding = {"input_ids": [zlib.crc32(text[start:end].encode('utf-8')) for start, end in offsets]}
+        if return_offsets_mapping:
+            encoding["offset_mapping"] = offsets
+        return encoding
+
+    @staticmethod
+    def num_special_tokens_to_add(pair: bool = False) -> int:
+        return 2
+
+
+class HashingEncoder:
+    """
+    Deterministic stand-in for a SentenceTransformer: words are hashed into a bag-of-words vector
+    that is L2 normalised. Texts sharing words end up close, which is enough to exercise retrieval.
+    """
+
+    def __init__(self, dimension: int = 384, max_seq_length: int = 256):
+        self.dimension = dimension
+        self.max_seq_length = max_seq_length
+        self.tokenizer = _RegexTokenizer()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts: List[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype='float32')
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                embeddings[row, zlib.crc32(word.encode('utf-8')) % self.dimension] += 1.0
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+def write_synthetic_pdf(path: Path, pages: int, words_per_page: int, seed: int = 42) -> None:
+    import pymupdf
+
+    rng = np.random.default_rng(seed)
+    document = pymupdf.open()
+    words_per_line = 12
+    for _ in range(pages):
+        page = document.new_page()
+        words = [VOCABULARY[i] for i in rng.integers(0, len(VOCABULARY), size=words_per_page)]
+        # Figures make the text look like a financial report and give the tokenizer numbers to split
+        for position in range(0, words_per_page, 9):
+            words[position] = f"{rng.integers(1_000, 9_999_999):,}"
+        lines = [" ".join(words[i:i + words_per_line]) + "." for i in range(0, len(words), words_per_line)]
+        for line_num, line in enumerate(lines):
+            page.insert_text((36, 36 + 11 * line_num), line, fontsize=8)
+    document.save(str(path))
+    document.close()
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def latency_summary(latencies: List[float]) -> Dict:
+    return {"p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 3),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 3)}
+
+
+def benchmark(pdf_path: Path, encoder_name: str, encoder, index_type: IndexType, queries: int, top_k: int) -> Dict:
+    result = {}
+
+    retriever, result["retriever_build_seconds"] = timed(FaissRetriever, Pdf(pdf_path), encoder_name,
+                                                         index_type=index_type)
+
+    # The stages of the build above, one at a time
+    pdf = Pdf(pdf_path)
+    text, result["get_text_seconds"] = timed(pdf.get_text)
+    chunker = retriever.chunker
+    chunked, result["chunk_seconds"] = timed(chunker.chunk_pages, pdf.pages)
+    _, result["chunk_text_seconds"] = timed(FaissRetriever.chunk_text, text, chunker.chunk_tokens, chunker.tokenizer,
+                                            chunker.overlap_tokens)
+    embeddings, result["embedding_seconds"] = timed(encoder.encode, chunked.texts)
+    result["chunks"] = len(chunked.texts)
+    result["chunks_per_second"] = round(len(chunked.texts) / max(result["embedding_seconds"], 1e-9), 1)
+    _, result["build_index_seconds"] = timed(build_index, embeddings, index_type,
+                                             ids=np.arange(len(chunked.texts)), **retriever.index_params)
+
+    questions = [QUERIES[i % len(QUERIES)] for i in range(queries)]
+    latencies = [timed(retriever.retrieve, question, top_k)[1] for question in questions]
+    result["retrieve"] = latency_summary(latencies)
+    _, many_seconds = timed(retriever.retrieve_many, questions, top_k)
+    result["retrieve_many_queries_per_second"] = round(len(questions) / max(many_seconds, 1e-9), 1)
+
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    chat = RagChat(retriever, model=FakeListChatModel(responses=["This is a stub answer."]),
+                   context_builder=ContextBuilder(retriever, lambda texts: [len(t.split()) for t in texts],
+                                                  token_budget=2000))
+    latencies = [timed(chat.ask, question)[1] for question in questions]
+    result["ask"] = latency_summary(latencies)
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in result.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200], help="Sizes of the synthetic PDFs")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--encoder", type=str, default=FAKE_ENCODER,
+                        help=f"{FAKE_ENCODER} or the name of a locally available sentence-transformers model")
+    parser.add_argument("--index-type", type=str, default=IndexType.AUTO.value,
+                        choices=[index_type.value for index_type in IndexType])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", type=str, default=None, help="Optional path for the JSON results")
+    args = parser.parse_args()
+
+    if args.encoder == FAKE_ENCODER:
+        register_embedding_model(FAKE_ENCODER, HashingEncoder())
+    from retrievers.faiss_retriever import load_embedding_model
+    encoder = load_embedding_model(args.encoder)
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in args.pages:
+            pdf_path = Path(directory) / f"synthetic_{pages}.pdf"
+            _, generate_seconds = timed(write_synthetic_pdf, pdf_path, pages, args.words_per_page)
+            result = {"pages": pages, "pdf_bytes": pdf_path.stat().st_size,
+                      "generate_pdf_seconds": round(generate_seconds, 4)}
+            result.update(benchmark(pdf_path, args.encoder, encoder, IndexType(args.index_type),
+                                    args.queries, args.top_k))
+            results.append(result)
+
+    report = json.dumps({
+        "encoder": args.encoder,
+        "index_type": args.index_type,
+        "words_per_page": args.words_per_page,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
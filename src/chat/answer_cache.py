@@ -0,0 +1,164 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+class _Entry(NamedTuple):
+    document_id: str
+    query: str
+    embedding: np.ndarray
+    answer: str
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by document and query embedding. A query whose cosine similarity to a cached query
+    of the same document reaches ``similarity_threshold`` gets the cached answer.
+
+    Entries are evicted least recently used beyond ``max_entries`` and expire after ``ttl_seconds``.
+    With ``path`` every new entry is appended to a JSON lines file that is replayed on start-up and
+    compacted once it holds twice as many lines as the cache.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.92, max_entries: int = 1024,
+                 ttl_seconds: Optional[float] = None, path: Optional[Path] = None):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._matrices: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._next_id = 0
+        self._file_lines = 0
+        self._lock = threading.Lock()
+        if path and path.exists():
+            self._load()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, document_id: str, embedding: np.ndarray) -> Optional[str]:
+        return self.get_many(document_id, embedding[None, :])[0]
+
+    def get_many(self, document_id: str, embeddings: np.ndarray) -> List[Optional[str]]:
+        with self._lock:
+            self._expire()
+            if document_id not in self._matrices:
+                self._build_matrix(document_id)
+            entry_ids, matrix = self._matrices[document_id]
+            answers: List[Optional[str]] = [None] * len(embeddings)
+            if len(entry_ids):
+                similarities = matrix @ self._normalize(embeddings).T
+                best = similarities.argmax(axis=0)
+                for i, row in enumerate(best):
+                    if similarities[row, i] >= self.similarity_threshold:
+                        entry_id = int(entry_ids[row])
+                        self._entries.move_to_end(entry_id)
+                        answers[i] = self._entries[entry_id].answer
+            found = sum(answer is not None for answer in answers)
+            self.hits += found
+            self.misses += len(answers) - found
+            return answers
+
+    def put(self, document_id: str, query: str, embedding: np.ndarray, answer: str) -> None:
+        self.put_many(document_id, [query], embedding[None, :], [answer])
+
+    def put_many(self, document_id: str, queries: List[str], embeddings: np.ndarray, answers: List[str]) -> None:
+        entries = [_Entry(document_id, query, normalized, answer, time.time())
+                   for query, normalized, answer in zip(queries, self._normalize(embeddings), answers)]
+        with self._lock:
+            for entry in entries:
+                self._add(entry)
+            if self.path:
+                self._append(entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+            if self.path and self.path.exists():
+                self.path.unlink()
+            self._file_lines = 0
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "hit_rate": self.hit_rate}
+
+    def _add(self, entry: _Entry) -> None:
+        self._entries[self._next_id] = entry
+        self._next_id += 1
+        self._matrices.pop(entry.document_id, None)
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._matrices.pop(evicted.document_id, None)
+
+    def _expire(self) -> None:
+        if self.ttl_seconds is None:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry.created_at < cutoff]
+        for entry_id in expired:
+            self._matrices.pop(self._entries.pop(entry_id).document_id, None)
+
+    def _build_matrix(self, document_id: str) -> None:
+        # One (entries x dim) matrix per document turns a lookup into a single matrix product
+        entry_ids = [entry_id for entry_id, entry in self._entries.items() if entry.document_id == document_id]
+        matrix = (np.vstack([self._entries[entry_id].embedding for entry_id in entry_ids])
+                  if entry_ids else np.empty((0, 0), dtype='float32'))
+        self._matrices[document_id] = (np.array(entry_ids, dtype='int64'), matrix)
+
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype='float32')
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+    def _append(self, entries: List[_Entry]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as file:
+            for entry in entries:
+                file.write(self._serialize(entry) + "\n")
+        self._file_lines += len(entries)
+        if self._file_lines > 2 * self.max_entries:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for entry in self._entries.values():
+                file.write(self._serialize(entry) + "\n")
+        tmp_path.replace(self.path)
+        self._file_lines = len(self._entries)
+
+    def _load(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                    self._add(_Entry(record["document_id"], record["query"],
+                                     np.array(record["embedding"], dtype='float32'), record["answer"],
+                                     record["created_at"]))
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Skipping unreadable answer cache line in {self.path}: {e}")
+                self._file_lines += 1
+        self._expire()
+        logger.info(f"Loaded {len(self._entries)} cached answers from {self.path}")
+
+    @staticmethod
+    def _serialize(entry: _Entry) -> str:
+        return json.dumps({"document_id": entry.document_id, "query": entry.query,
+                           "embedding": entry.embedding.tolist(), "answer": entry.answer,
+                           "created_at": entry.created_at})
@@ -0,0 +1,166 @@
+import re
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from config import ConfigManager
+from retrievers.faiss_retriever import FaissRetriever
+from utils.tracing import Tracer, traced
+
+# Counts the tokens of every text in one call, so that tokenizers can batch
+TokenCounter = Callable[[List[str]], List[int]]
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+class PackedContext(NamedTuple):
+    text: str
+    chunk_ids: List[int]
+    tokens: int
+    tokens_saved: int
+    duplicates_dropped: int
+
+
+def openai_token_counter(model_name: str) -> TokenCounter:
+    """
+    tiktoken counter for an OpenAI model, loaded on the first count. tiktoken downloads its encodings
+    on first use; when that is not possible the counter estimates four characters per token.
+    """
+    encoding = None
+
+    def count_tokens(texts: List[str]) -> List[int]:
+        nonlocal encoding
+        if encoding is None:
+            encoding = _tiktoken_encoding(model_name)
+        if encoding is False:
+            return [len(text) // 4 + 1 for text in texts]
+        return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+    return count_tokens
+
+
+def _tiktoken_encoding(model_name: str):
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"No tiktoken encoding for {model_name}, estimating token counts: {e}")
+        return False
+
+
+def tokenizer_token_counter(get_tokenizer: Callable) -> TokenCounter:
+    """
+    Counter for a HuggingFace tokenizer. Takes a callable so that the model is not loaded before the first count.
+    """
+    return lambda texts: [len(input_ids) for input_ids in
+                          get_tokenizer()(texts, add_special_tokens=False)["input_ids"]]
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into a prompt context of at most ``token_budget`` tokens.
+
+    Chunks are taken best first. A chunk whose embedding has a cosine similarity of at least
+    ``dedup_threshold`` with a chunk already packed is dropped as a near-duplicate, which is common
+    with overlapping chunks. The first chunk that does not fit is cut at the last sentence boundary
+    within the budget and packing stops there.
+    """
+
+    def __init__(self, retriever: FaissRetriever, count_tokens: TokenCounter, token_budget: int,
+                 dedup_threshold: Optional[float] = None, separator: str = "\n\n---\n\n"):
+        self.retriever = retriever
+        self.count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold if dedup_threshold is not None \
+            else ConfigManager().context_dedup_threshold
+        self.separator = separator
+        self._separator_tokens: Optional[int] = None
+        self.tokens_saved = 0
+
+    @staticmethod
+    def budget_for(model_name: str) -> int:
+        budgets = ConfigManager().context_token_budgets
+        return budgets.get(model_name, budgets['default'])
+
+    @property
+    def separator_tokens(self) -> int:
+        if self._separator_tokens is None:
+            self._separator_tokens = self.count_tokens([self.separator])[0]
+        return self._separator_tokens
+
+    def build(self, ids: np.ndarray) -> PackedContext:
+        return self.build_many(ids[None, :])[0]
+
+    @traced("chat.build_context")
+    def build_many(self, ids: np.ndarray) -> List[PackedContext]:
+        """
+        Packs one context per row of the (queries x top_k) chunk ids returned by
+        FaissRetriever.search_ids. Rows are expected best first, as FAISS returns them.
+        """
+        # Token counts and embeddings for all distinct chunks of all queries in one call each
+        unique_ids = np.unique(ids[ids >= 0])
+        if not len(unique_ids):
+            return [PackedContext("", [], 0, 0, 0) for _ in ids]
+        position = {int(idx): i for i, idx in enumerate(unique_ids)}
+        token_counts = self.count_tokens([self.retriever.chunks[idx] for idx in unique_ids])
+        embeddings = self.retriever.chunk_embeddings(unique_ids)
+        embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        contexts = []
+        for row in ids:
+            row = [int(idx) for idx in row if idx >= 0]
+            positions = [position[idx] for idx in row]
+            contexts.append(self._pack(row, [token_counts[i] for i in positions], embeddings[positions]))
+        saved = sum(context.tokens_saved for context in contexts)
+        tracer = Tracer()
+        if tracer.enabled:
+            for context in contexts:
+                tracer.observe("chat.context_tokens", context.tokens)
+            tracer.count("chat.prompt_tokens_saved", saved)
+        self.tokens_saved += saved
+        logger.debug(f"Packed {len(contexts)} contexts into {sum(context.tokens for context in contexts)} tokens, "
+                     f"saving {saved} prompt tokens")
+        return contexts
+
+    def _pack(self, ids: List[int], token_counts: List[int], embeddings: np.ndarray) -> PackedContext:
+        # What joining every chunk whole would have cost
+        unpacked_tokens = sum(token_counts) + self.separator_tokens * max(0, len(ids) - 1)
+        texts, packed_ids, kept, used, duplicates = [], [], [], 0, 0
+        for i, (idx, tokens) in enumerate(zip(ids, token_counts)):
+            if kept and float((embeddings[kept] @ embeddings[i]).max()) >= self.dedup_threshold:
+                duplicates += 1
+                continue
+            cost = tokens + (self.separator_tokens if texts else 0)
+            if used + cost <= self.token_budget:
+                texts.append(self.retriever.chunks[idx])
+                packed_ids.append(idx)
+                kept.append(i)
+                used += cost
+                continue
+            remaining = self.token_budget - used - (self.separator_tokens if texts else 0)
+            trimmed, trimmed_tokens = self._trim(self.retriever.chunks[idx], remaining)
+            if trimmed:
+                texts.append(trimmed)
+                packed_ids.append(idx)
+                used += trimmed_tokens + (self.separator_tokens if len(texts) > 1 else 0)
+            break
+        return PackedContext(self.separator.join(texts), packed_ids, used, unpacked_tokens - used, duplicates)
+
+    def _trim(self, text: str, max_tokens: int) -> Tuple[str, int]:
+        """
+        Longest prefix of ``text`` that ends on a sentence boundary and fits in ``max_tokens``.
+        """
+        if max_tokens <= 0:
+            return "", 0
+        ends = [match.start() for match in _SENTENCE_END.finditer(text)] + [len(text)]
+        prefixes = [text[:end] for end in ends]
+        best = ("", 0)
+        for prefix, tokens in zip(prefixes, self.count_tokens(prefixes)):
+            if tokens > max_tokens:
+                break
+            best = (prefix, tokens)
+        return best
@@ -0,0 +1,55 @@
+import time
+from typing import Optional
+
+
+class GenerationStats:
+    """
+    Timing of one streamed answer. The clock starts when the question is asked, so time to first
+    token includes retrieval and prompt processing, as the user experiences it.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.tokens = 0
+
+    def on_token(self, count: int = 1) -> None:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.tokens += count
+
+    def finish(self, tokens: Optional[int] = None) -> None:
+        """
+        :param tokens: exact number of generated tokens when known, replacing the streamed count
+        """
+        self.finished_at = time.perf_counter()
+        if tokens is not None:
+            self.tokens = tokens
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        return self.first_token_at - self.started_at if self.first_token_at is not None else None
+
+    @property
+    def total_seconds(self) -> Optional[float]:
+        return self.finished_at - self.started_at if self.finished_at is not None else None
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        # Decode throughput: the tokens after the first one over the time spent producing them
+        if self.finished_at is None or self.first_token_at is None or self.tokens < 2:
+            return None
+        elapsed = self.finished_at - self.first_token_at
+        return (self.tokens - 1) / elapsed if elapsed > 0 else None
+
+    def as_dict(self) -> dict:
+        return {
+            "time_to_first_token": self.time_to_first_token,
+            "tokens_per_second": self.tokens_per_second,
+            "tokens": self.tokens,
+            "total_seconds": self.total_seconds,
+        }
+
+    def __repr__(self):
+        return f"GenerationStats({self.as_dict()})"
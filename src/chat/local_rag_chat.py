@@ -1,41 +1,61 @@
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_huggingface import HuggingFacePipeline
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-import torch
+import queue
+import time
+from collections import deque
+from threading import Thread
+from typing import TYPE_CHECKING, Deque, Dict, Iterator, List, Optional
 
+from chat.answer_cache import SemanticAnswerCache
+from chat.context_builder import ContextBuilder, PackedContext, tokenizer_token_counter
+from chat.generation_stats import GenerationStats
+from chat.retrieval_mixin import RetrievalMixin
+from config import ConfigManager
 from retrievers.faiss_retriever import FaissRetriever
+from utils.lazy_import import lazy_import
+from utils.tracing import Tracer, traced
 
+if TYPE_CHECKING:
+    from langchain_huggingface import HuggingFacePipeline
+    from chat.local_model import LocalModel
 
-class LocalRagChat:
-    def __init__(self, retriever: FaissRetriever):
-        # Initialize tokenizer and model separately
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            "microsoft/Phi-3.5-mini-instruct",
-            trust_remote_code=True
-        )
-        self.base_model = AutoModelForCausalLM.from_pretrained(
-            "microsoft/Phi-3.5-mini-instruct",
-            torch_dtype=torch.float16,
-            device_map="mps",
-            trust_remote_code=True
-        )
+torch = lazy_import("torch")
 
-        # Create the pipeline
-        self.model = HuggingFacePipeline(
-            pipeline=pipeline(
-                "text-generation",
-                model=self.base_model,
-                tokenizer=self.tokenizer,
-                max_new_tokens=512,
-                temperature=0.7,
-                top_p=0.9,
-                repetition_penalty=1.1,
-                do_sample=True
-            )
+
+class LocalRagChat(RetrievalMixin):
+    def __init__(self, retriever: FaissRetriever, answer_cache: Optional[SemanticAnswerCache] = None,
+                 model_name: Optional[str] = None, device: Optional[str] = None, quantize: Optional[bool] = None,
+                 batch_size: int = 8, context_builder: Optional[ContextBuilder] = None,
+                 stream_timeout: Optional[float] = 120.0):
+        """
+        The model is loaded on the first question, not here, and shared by every LocalRagChat of the
+        process using the same configuration.
+
+        :param device: cuda, mps or cpu; picked automatically when omitted
+        :param quantize: dynamic int8 quantization, defaults to on for cpu
+        :param batch_size: prompts generated together by ask_batch
+        :param context_builder: packs the retrieved chunks into the prompt; defaults to the token budget
+            of the model from the config, counted with the model's tokenizer
+        :param stream_timeout: seconds ask_stream waits for the next piece of the answer before giving up
+        """
+        self.model_name = model_name
+        self.device = device
+        self.quantize = quantize
+        self.batch_size = batch_size
+        self.stream_timeout = stream_timeout
+        self._local_model: Optional["LocalModel"] = None
+        self._model: Optional["HuggingFacePipeline"] = None
+        self._chain = None
+
+        # Shared by the pipeline and the streaming generate call
+        self.generation_kwargs = dict(
+            max_new_tokens=512,
+            temperature=0.7,
+            top_p=0.9,
+            repetition_penalty=1.1,
+            do_sample=True
         )
 
         self.retriever = retriever
+        from langchain_core.prompts import ChatPromptTemplate
         self.prompt = ChatPromptTemplate.from_template(
             """Answer the question based on this context:
             {CONTEXT}
@@ -44,8 +64,174 @@ class LocalRagChat:
 
             Answer:"""
         )
-        self.chain = self.prompt | self.model | StrOutputParser()
+        self.last_stats: Optional[GenerationStats] = None
+        self.stats_history: Deque[GenerationStats] = deque(maxlen=100)
+        self.last_batch_stats: Optional[Dict] = None
+        self.answer_cache = answer_cache
+        self.context_builder = context_builder or ContextBuilder(
+            retriever, tokenizer_token_counter(lambda: self.tokenizer),
+            ContextBuilder.budget_for(model_name or ConfigManager().local_llm))
+        self.last_contexts: List[PackedContext] = []
+
+    @property
+    def local_model(self) -> "LocalModel":
+        if self._local_model is None:
+            # torch and transformers are only imported once a model is actually needed
+            from chat.local_model import load_local_model
+            self._local_model = load_local_model(self.model_name, self.device, quantize=self.quantize)
+        return self._local_model
+
+    @property
+    def tokenizer(self):
+        return self.local_model.tokenizer
+
+    @property
+    def base_model(self):
+        return self.local_model.model
 
+    @property
+    def model(self) -> "HuggingFacePipeline":
+        if self._model is None:
+            from langchain_huggingface import HuggingFacePipeline
+            from transformers import pipeline
+            self._model = HuggingFacePipeline(
+                pipeline=pipeline(
+                    "text-generation",
+                    model=self.base_model,
+                    tokenizer=self.tokenizer,
+                    **self.generation_kwargs
+                )
+            )
+        return self._model
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            from langchain_core.output_parsers import StrOutputParser
+            self._chain = self.prompt | self.model | StrOutputParser()
+        return self._chain
+
+    @traced("local_rag_chat.ask")
     def ask(self, query: str):
-        context = "\n\n---\n\n".join(self.retriever.retrieve(query))
-        return self.chain.invoke({"CONTEXT": context, "QUERY": query})
\ No newline at end of file
+        query_embedding = self._encode([query])
+        cached = self._cached_answers([query], query_embedding)[0]
+        if cached is not None:
+            return cached
+        context = self._contexts([query], query_embedding)[0]
+        with Tracer().span("llm.generate"):
+            answer = self.chain.invoke({"CONTEXT": context, "QUERY": query})
+        self._cache_answers([query], query_embedding, [answer])
+        return answer
+
+    def ask_many(self, queries: List[str]) -> List[str]:
+        return self.ask_batch(queries)
+
+    @traced("local_rag_chat.ask_batch")
+    def ask_batch(self, queries: List[str], batch_size: Optional[int] = None) -> List[str]:
+        """
+        Answers all queries with batched generation and returns the answers in input order.
+        Contexts are retrieved for every query in one search before any generation starts.
+        """
+        query_embeddings = self._encode(queries)
+        answers = self._cached_answers(queries, query_embeddings)
+        misses = [i for i, answer in enumerate(answers) if answer is None]
+        if misses:
+            contexts = self._contexts([queries[i] for i in misses], self._rows(query_embeddings, misses))
+            prompts = [self.prompt.format(CONTEXT=context, QUERY=queries[i])
+                       for context, i in zip(contexts, misses)]
+            generated = self.generate_batch(prompts, batch_size)
+            for i, answer in zip(misses, generated):
+                answers[i] = answer
+            self._cache_answers([queries[i] for i in misses], self._rows(query_embeddings, misses), generated)
+        return answers
+
+    @traced("llm.generate_batch")
+    def generate_batch(self, prompts: List[str], batch_size: Optional[int] = None) -> List[str]:
+        """
+        Generates ``batch_size`` prompts at a time. Prompts are sorted by token length first, so each
+        batch holds prompts of similar length and wastes little compute on padding.
+        Token counts and throughput of the call end up in last_batch_stats.
+        """
+        batch_size = batch_size or self.batch_size
+        start = time.perf_counter()
+        lengths = [len(input_ids) for input_ids in self.tokenizer(prompts)["input_ids"]]
+        order = sorted(range(len(prompts)), key=lambda i: lengths[i])
+        answers = [""] * len(prompts)
+        generated_tokens = 0
+        for batch_start in range(0, len(order), batch_size):
+            batch = order[batch_start:batch_start + batch_size]
+            inputs = self.tokenizer([prompts[i] for i in batch], return_tensors="pt",
+                                    padding=True).to(self.base_model.device)
+            with torch.inference_mode():
+                output = self.base_model.generate(**inputs, pad_token_id=self.tokenizer.pad_token_id,
+                                                  **self.generation_kwargs)
+            new_tokens = output[:, inputs["input_ids"].shape[1]:]
+            # Sequences that stop early are padded up to the longest one in the batch
+            generated_tokens += int((new_tokens != self.tokenizer.pad_token_id).sum())
+            for i, answer in zip(batch, self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)):
+                answers[i] = answer
+        seconds = time.perf_counter() - start
+        tracer = Tracer()
+        if tracer.enabled:
+            for length in lengths:
+                tracer.observe("llm.prompt_tokens", length)
+            tracer.count("llm.generated_tokens", generated_tokens)
+        self.last_batch_stats = {
+            "prompts": len(prompts),
+            "batch_size": batch_size,
+            "prompt_tokens": sum(lengths),
+            "generated_tokens": generated_tokens,
+            "seconds": seconds,
+            "tokens_per_second": generated_tokens / seconds if seconds > 0 else None,
+        }
+        return answers
+
+    @traced("local_rag_chat.ask_stream")
+    def ask_stream(self, query: str) -> Iterator[str]:
+        """
+        Yields the answer as it is generated. Generation runs in a background thread feeding a
+        TextIteratorStreamer; timing and the exact generated token count end up in last_stats.
+        """
+        stats = GenerationStats()
+        self.last_stats = stats
+        self.stats_history.append(stats)
+        query_embedding = self._encode([query])
+        cached = self._cached_answers([query], query_embedding)[0]
+        if cached is not None:
+            stats.on_token()
+            stats.finish()
+            yield cached
+            return
+        context = self._contexts([query], query_embedding)[0]
+        prompt = self.prompt.format(CONTEXT=context, QUERY=query)
+        inputs = self.tokenizer(prompt, return_tensors="pt").to(self.base_model.device)
+        from transformers import TextIteratorStreamer
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                        timeout=self.stream_timeout)
+        errors = []
+
+        def generate():
+            try:
+                self.base_model.generate(**inputs, streamer=streamer, **self.generation_kwargs)
+            except Exception as e:
+                # Ends the stream, otherwise the consumer would wait for pieces that never come
+                errors.append(e)
+                streamer.end()
+
+        thread = Thread(target=generate, daemon=True)
+        thread.start()
+        pieces = []
+        try:
+            for piece in streamer:
+                if piece:
+                    stats.on_token()
+                    pieces.append(piece)
+                    yield piece
+        except queue.Empty:
+            raise TimeoutError(f"No output from {self.local_model.model_name} for {self.stream_timeout} s")
+        thread.join()
+        if errors:
+            raise errors[0]
+        # The streamer emits decoded words rather than tokens, so count the real tokens at the end
+        stats.finish(tokens=len(self.tokenizer.encode("".join(pieces), add_special_tokens=False)))
+        self._cache_answers([query], query_embedding, ["".join(pieces)])
@@ -1,25 +1,140 @@
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Iterator, List, Optional
 
+from chat.answer_cache import SemanticAnswerCache
+from chat.context_builder import ContextBuilder, PackedContext, openai_token_counter
+from chat.generation_stats import GenerationStats
+from chat.retrieval_mixin import RetrievalMixin
 from config import ConfigManager
 from retrievers.faiss_retriever import FaissRetriever
+from utils.rate_limiter import AsyncRateLimiter
+from utils.retry import async_retry_on_rate_limit
+from utils.tracing import Tracer, traced
 
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
 
-class RagChat:
 
-    def __init__(self, retriever: FaissRetriever):
-        self.model = ChatOpenAI(model_name=ConfigManager().openai_llm)
+class RagChat(RetrievalMixin):
+
+    def __init__(self, retriever: FaissRetriever, model: Optional["BaseChatModel"] = None,
+                 requests_per_minute: Optional[float] = None, answer_cache: Optional[SemanticAnswerCache] = None,
+                 context_builder: Optional[ContextBuilder] = None):
+        """
+        :param model: chat model to use instead of ChatOpenAI, e.g. a FakeListChatModel to run offline
+        :param requests_per_minute: client-side rate limit for aask/aask_many
+        :param answer_cache: returns earlier answers to semantically equivalent questions without calling the LLM
+        :param context_builder: packs the retrieved chunks into the prompt; defaults to the token budget
+            of the model from the config, counted with tiktoken
+        """
+        # LangChain is imported on construction, not with the module, to keep imports of this package fast
+        from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
+        if model is None:
+            from langchain_openai import ChatOpenAI
+            model = ChatOpenAI(model_name=ConfigManager().openai_llm)
+        self.model = model
         self.retriever = retriever
         self.prompt = ChatPromptTemplate.from_template("Answer the question based on this context:\n"
                                                        "{CONTEXT}\n\n\n"
                                                        "Question:\n"
                                                        "{QUERY}")
         self.chain = self.prompt | self.model | StrOutputParser()
+        self.last_stats: Optional[GenerationStats] = None
+        self.stats_history: Deque[GenerationStats] = deque(maxlen=100)
+        self.rate_limiter = AsyncRateLimiter(requests_per_minute or ConfigManager().openai_requests_per_minute)
+        self.answer_cache = answer_cache
+        model_name = getattr(self.model, "model_name", None) or ConfigManager().openai_llm
+        self.context_builder = context_builder or ContextBuilder(retriever, openai_token_counter(model_name),
+                                                                 ContextBuilder.budget_for(model_name))
+        self.last_contexts: List[PackedContext] = []
 
+    @traced("rag_chat.ask")
     def ask(self, query: str):
-        context = "\n\n---\n\n".join(self.retriever.retrieve(query))
-        return self.chain.invoke({"CONTEXT": context,"QUERY": query})
+        query_embedding = self._encode([query])
+        cached = self._cached_answers([query], query_embedding)[0]
+        if cached is not None:
+            return cached
+        context = self._contexts([query], query_embedding)[0]
+        with Tracer().span("llm.generate"):
+            answer = self.chain.invoke({"CONTEXT": context, "QUERY": query})
+        self._cache_answers([query], query_embedding, [answer])
+        return answer
+
+    @traced("rag_chat.ask_many")
+    def ask_many(self, queries: List[str]) -> List[str]:
+        query_embeddings = self._encode(queries)
+        answers = self._cached_answers(queries, query_embeddings)
+        misses = [i for i, answer in enumerate(answers) if answer is None]
+        if misses:
+            contexts = self._contexts([queries[i] for i in misses], self._rows(query_embeddings, misses))
+            with Tracer().span("llm.generate", prompts=len(misses)):
+                generated = self.chain.batch([{"CONTEXT": context, "QUERY": queries[i]}
+                                              for context, i in zip(contexts, misses)])
+            for i, answer in zip(misses, generated):
+                answers[i] = answer
+            self._cache_answers([queries[i] for i in misses], self._rows(query_embeddings, misses), generated)
+        return answers
+
+    @traced("rag_chat.ask_stream")
+    def ask_stream(self, query: str) -> Iterator[str]:
+        """
+        Yields the answer piece by piece as the model streams it. Timing is recorded in last_stats;
+        OpenAI streams roughly one token per chunk, so chunks are counted as tokens.
+        """
+        stats = GenerationStats()
+        self.last_stats = stats
+        self.stats_history.append(stats)
+        query_embedding = self._encode([query])
+        cached = self._cached_answers([query], query_embedding)[0]
+        if cached is not None:
+            stats.on_token()
+            stats.finish()
+            yield cached
+            return
+        context = self._contexts([query], query_embedding)[0]
+        pieces = []
+        for token in self.chain.stream({"CONTEXT": context, "QUERY": query}):
+            if token:
+                stats.on_token()
+                pieces.append(token)
+                yield token
+        stats.finish()
+        self._cache_answers([query], query_embedding, ["".join(pieces)])
+
+    async def aask(self, query: str) -> str:
+        return (await self.aask_many([query]))[0]
+
+    @traced("rag_chat.aask_many")
+    async def aask_many(self, queries: List[str], concurrency: Optional[int] = None) -> List[str]:
+        """
+        Answers all queries with at most ``concurrency`` requests in flight. Queries are encoded and
+        searched in one batched call in a worker thread, since that work is CPU-bound and would block
+        the event loop. Answers are returned in the order of ``queries``.
+        """
+        semaphore = asyncio.Semaphore(concurrency or ConfigManager().openai_max_concurrency)
+        query_embeddings = await asyncio.to_thread(self._encode, queries)
+        answers = self._cached_answers(queries, query_embeddings)
+        misses = [i for i, answer in enumerate(answers) if answer is None]
+        if not misses:
+            return answers
+        contexts = await asyncio.to_thread(self._contexts, [queries[i] for i in misses],
+                                            self._rows(query_embeddings, misses))
+
+        async def answer(context: str, query: str) -> str:
+            async with semaphore:
+                return await self._ainvoke({"CONTEXT": context, "QUERY": query})
+
+        generated = await asyncio.gather(*(answer(context, queries[i]) for context, i in zip(contexts, misses)))
+        for i, answer_text in zip(misses, generated):
+            answers[i] = answer_text
+        self._cache_answers([queries[i] for i in misses], self._rows(query_embeddings, misses), list(generated))
+        return answers
+
+    @traced("llm.generate")
+    async def _ainvoke(self, inputs: dict) -> str:
+        return await async_retry_on_rate_limit(lambda: self.chain.ainvoke(inputs), limiter=self.rate_limiter)
 
 #
 # if __name__ == "__main__":
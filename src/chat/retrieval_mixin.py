@@ -0,0 +1,43 @@
+from typing import List, Optional
+
+import numpy as np
+
+from chat.answer_cache import SemanticAnswerCache
+from chat.context_builder import ContextBuilder, PackedContext
+from retrievers.bm25_index import RetrievalMode
+from retrievers.faiss_retriever import FaissRetriever
+
+
+class RetrievalMixin:
+    """
+    Query encoding, answer cache lookups and context packing shared by RagChat and LocalRagChat.
+    The query embeddings serve both the answer cache lookup and the index search.
+    """
+    retriever: FaissRetriever
+    answer_cache: Optional[SemanticAnswerCache]
+    context_builder: ContextBuilder
+    last_contexts: List[PackedContext]
+
+    def _encode(self, queries: List[str]) -> Optional[np.ndarray]:
+        # Lexical retrieval without an answer cache answers without running the embedding model
+        if self.answer_cache is None and self.retriever.retrieval_mode == RetrievalMode.LEXICAL:
+            return None
+        return self.retriever.encode(queries)
+
+    @staticmethod
+    def _rows(query_embeddings: Optional[np.ndarray], rows: List[int]) -> Optional[np.ndarray]:
+        return None if query_embeddings is None else query_embeddings[rows]
+
+    def _contexts(self, queries: List[str], query_embeddings: Optional[np.ndarray]) -> List[str]:
+        _, ids = self.retriever.query_ids(queries, query_embeddings=query_embeddings)
+        self.last_contexts = self.context_builder.build_many(ids)
+        return [packed.text for packed in self.last_contexts]
+
+    def _cached_answers(self, queries: List[str], query_embeddings: Optional[np.ndarray]) -> List[Optional[str]]:
+        if self.answer_cache is None:
+            return [None] * len(queries)
+        return self.answer_cache.get_many(self.retriever.document_id, query_embeddings)
+
+    def _cache_answers(self, queries: List[str], query_embeddings: Optional[np.ndarray], answers: List[str]) -> None:
+        if self.answer_cache is not None:
+            self.answer_cache.put_many(self.retriever.document_id, queries, query_embeddings, answers)
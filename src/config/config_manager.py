@@ -8,8 +8,28 @@ class ConfigManager(metaclass=SingletonMeta):
     def __init__(self):
         self.openai_llm = 'gpt-4o'
         self.openai_embedding_model = 'text-embedding-3-small'
+        self.openai_max_concurrency = 8
+        self.local_llm = 'microsoft/Phi-3.5-mini-instruct'
+        self.openai_requests_per_minute = None
         self.resources_path = self.get_project_root() / "resources"
         self.pdf_file_path = self.resources_path / "64661631e57913001105970d.pdf"
+        self.index_cache_path = self.get_project_root() / ".cache" / "faiss_index"
+        self.index_cache_max_bytes = 2 * 1024 ** 3
+        self.mmap_store_path = self.get_project_root() / ".cache" / "mmap_store"
+        # Tokens of retrieved context per prompt, by chat model
+        self.context_token_budgets = {
+            'gpt-4o': 3000,
+            'microsoft/Phi-3.5-mini-instruct': 1500,
+            'default': 2000,
+        }
+        self.context_dedup_threshold = 0.95
+        self.tracing_enabled = False
+        # Query server (python -m server)
+        self.server_host = '127.0.0.1'
+        self.server_port = 8765
+        self.server_max_batch_size = 16
+        self.server_batch_window_ms = 10
+        self.server_max_queue_size = 256
 
     def configure(self, config_dict):
         for key, value in config_dict.items():
@@ -5,6 +5,7 @@ from chat.local_rag_chat import LocalRagChat
 from chat.rag_chat import RagChat
 from config import ConfigManager
 from retrievers.faiss_retriever import FaissRetriever
+from retrievers.index_cache import IndexCache
 
 if __name__ == '__main__':
     load_dotenv()
@@ -24,12 +25,12 @@ if __name__ == '__main__':
     FaissRetriever:
         - invokes get_text to get the text
         - chunks it into Documents
-        - creates a FAISS index
+        - creates a FAISS index, or loads it from the on-disk IndexCache
         
     Method:
         - retrieve: takes a query and returns the most similar chunks
     """
-    retriever = FaissRetriever(pdf)
+    retriever = FaissRetriever(pdf, cache=IndexCache())
 
     """
     RagChat:
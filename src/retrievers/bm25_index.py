@@ -0,0 +1,117 @@
+import re
+from collections import Counter
+from enum import Enum
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Keeps figures like 6,979,736 or 12.5 and tickers like BRK.B together as one term
+_TERM = re.compile(r"\w+(?:[.,]\w+)*")
+
+
+class RetrievalMode(Enum):
+    DENSE = "dense"
+    LEXICAL = "lexical"
+    HYBRID = "hybrid"
+
+
+def tokenize(text: str) -> List[str]:
+    return _TERM.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index over chunks with Okapi BM25 scoring.
+
+    Postings are stored in CSR form: the postings of term ``t`` are
+    ``doc_ids[indptr[t]:indptr[t + 1]]`` with their term frequencies in ``term_freqs``, so the
+    whole index is a handful of flat NumPy arrays.
+    """
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(chunks)
+        self.vocabulary: Dict[str, int] = {}
+        term_ids, doc_ids, term_freqs = [], [], []
+        doc_lengths = np.zeros(self.num_docs, dtype='int32')
+        for doc_id, chunk in enumerate(chunks):
+            terms = tokenize(chunk)
+            doc_lengths[doc_id] = len(terms)
+            for term, freq in Counter(terms).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc_id)
+                term_freqs.append(freq)
+
+        term_ids = np.array(term_ids, dtype='int32')
+        # Stable sort keeps the doc ids of every term in ascending order
+        order = np.argsort(term_ids, kind='stable')
+        self.doc_ids = np.array(doc_ids, dtype='int32')[order]
+        self.term_freqs = np.array(term_freqs, dtype='float32')[order]
+        self.indptr = np.zeros(len(self.vocabulary) + 1, dtype='int64')
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocabulary)), out=self.indptr[1:])
+
+        document_freqs = np.diff(self.indptr)
+        live_docs = max(1, int((doc_lengths > 0).sum()))
+        self.idf = np.log1p((live_docs - document_freqs + 0.5) / (document_freqs + 0.5)).astype('float32')
+        average_length = doc_lengths.sum() / live_docs
+        # Per-document part of the BM25 denominator, precomputed once
+        self.length_norm = (self.k1 * (1 - self.b + self.b * doc_lengths / max(average_length, 1e-9))
+                            ).astype('float32')
+
+    def __len__(self):
+        return self.num_docs
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.num_docs, dtype='float32')
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs, freqs = self.doc_ids[start:end], self.term_freqs[start:end]
+            # Doc ids are unique within a postings list, so fancy-index accumulation is safe
+            scores[docs] += self.idf[term_id] * freqs * (self.k1 + 1) / (freqs + self.length_norm[docs])
+        return scores
+
+    def search(self, queries: List[str], top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (scores, chunk ids) shaped (len(queries), top_k), best first like a FAISS search.
+        Higher scores are better; rows with fewer than top_k matching chunks are padded with id -1.
+        """
+        all_scores = np.zeros((len(queries), top_k), dtype='float32')
+        all_ids = np.full((len(queries), top_k), -1, dtype='int64')
+        for row, query in enumerate(queries):
+            scores = self.scores(query)
+            matching = np.flatnonzero(scores > 0)
+            if len(matching) > top_k:
+                matching = matching[np.argpartition(-scores[matching], top_k - 1)[:top_k]]
+            matching = matching[np.argsort(-scores[matching], kind='stable')]
+            all_scores[row, :len(matching)] = scores[matching]
+            all_ids[row, :len(matching)] = matching
+        return all_scores, all_ids
+
+    def memory_bytes(self) -> int:
+        return sum(array.nbytes for array in (self.doc_ids, self.term_freqs, self.indptr, self.idf, self.length_norm))
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], top_k: int = 5, k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuses several (queries x n) id rankings, best first and padded with -1, into one. Each id scores
+    the sum of 1 / (k + rank) over the rankings it appears in, which needs no score normalisation.
+    Returns (fused scores, ids) shaped (queries, top_k).
+    """
+    num_queries = len(rankings[0])
+    fused_scores = np.zeros((num_queries, top_k), dtype='float32')
+    fused_ids = np.full((num_queries, top_k), -1, dtype='int64')
+    for row in range(num_queries):
+        scores: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, idx in enumerate(ranking[row], start=1):
+                if idx >= 0:
+                    scores[int(idx)] = scores.get(int(idx), 0.0) + 1.0 / (k + rank)
+        best = sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+        for col, (idx, score) in enumerate(best):
+            fused_ids[row, col] = idx
+            fused_scores[row, col] = score
+    return fused_scores, fused_ids
@@ -0,0 +1,76 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class ChunkedPages(NamedTuple):
+    """
+    Chunk texts with their provenance: 1-based page number and character span within that page.
+    """
+    texts: List[str]
+    pages: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+
+
+class WhitespaceTokenizer:
+    """
+    Whitespace-separated words as tokens, with the offsets interface of a fast HuggingFace tokenizer.
+    """
+    is_fast = True
+    _word = re.compile(r"\S+")
+
+    def __call__(self, text, return_offsets_mapping=False, **kwargs):
+        offsets = [(match.start(), match.end()) for match in self._word.finditer(text)]
+        encoding = {"input_ids": list(range(len(offsets)))}
+        if return_offsets_mapping:
+            encoding["offset_mapping"] = offsets
+        return encoding
+
+
+class TokenChunker:
+    """
+    Splits pages into overlapping windows measured in embedding tokenizer tokens, so that no chunk
+    is silently truncated by the embedding model. Chunks never cross a page boundary.
+    """
+
+    def __init__(self, tokenizer, chunk_tokens: int, overlap_tokens: int = 0):
+        if chunk_tokens <= 0:
+            raise ValueError(f"chunk_tokens must be positive, got {chunk_tokens}")
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError(f"overlap_tokens must be in [0, {chunk_tokens}), got {overlap_tokens}")
+        if not getattr(tokenizer, "is_fast", False):
+            raise ValueError("TokenChunker needs a fast tokenizer to map tokens back to character offsets")
+        self.tokenizer = tokenizer
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def chunk_page(self, text: str) -> Tuple[List[str], List[int], List[int]]:
+        offsets = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True,
+                                 verbose=False)["offset_mapping"]
+        chunks, starts, ends = [], [], []
+        step = self.chunk_tokens - self.overlap_tokens
+        for i in range(0, len(offsets), step):
+            window = offsets[i:i + self.chunk_tokens]
+            start, end = window[0][0], window[-1][1]
+            chunks.append(text[start:end])
+            starts.append(start)
+            ends.append(end)
+            if i + self.chunk_tokens >= len(offsets):
+                break
+        return chunks, starts, ends
+
+    def chunk_pages(self, pages: List[str], page_numbers: Optional[List[int]] = None) -> ChunkedPages:
+        """
+        :param page_numbers: page number of each entry in ``pages``, defaults to 1..len(pages)
+        """
+        texts, page_nums, starts, ends = [], [], [], []
+        for page_num, page_text in zip(page_numbers or range(1, len(pages) + 1), pages):
+            page_chunks, page_starts, page_ends = self.chunk_page(page_text)
+            texts.extend(page_chunks)
+            page_nums.extend([page_num] * len(page_chunks))
+            starts.extend(page_starts)
+            ends.extend(page_ends)
+        return ChunkedPages(texts, np.array(page_nums, dtype='int32'),
+                            np.array(starts, dtype='int32'), np.array(ends, dtype='int32'))
@@ -0,0 +1,119 @@
+import heapq
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from artifacts.pdf import Pdf
+from config import ConfigManager
+from retrievers.faiss_retriever import FaissRetriever
+from retrievers.index_cache import IndexCache
+from utils.file_system import list_files
+
+
+def _build_shard(pdf_paths: List[Path], cache_dir: Path, cache_max_bytes: int, retriever_kwargs: dict) -> int:
+    # Runs in a worker process; the built indexes reach the parent through the on-disk cache
+    cache = IndexCache(cache_dir, cache_max_bytes)
+    chunks = 0
+    for pdf_path in pdf_paths:
+        chunks += len(FaissRetriever(Pdf(pdf_path), cache=cache, **retriever_kwargs).chunks)
+    return chunks
+
+
+class CorpusRetriever:
+    """
+    Retrieval across every PDF of a directory, one FaissRetriever per document.
+
+    Documents are grouped into shards of ``docs_per_shard``. Shards are built in parallel worker
+    processes into the IndexCache and are only loaded into memory when a query needs them; at most
+    ``max_loaded_shards`` stay resident. A query is encoded once, searched on the selected shards
+    concurrently and the per-document hits are merged into a global top-k by distance.
+    """
+
+    def __init__(self, directory: Optional[Path] = None, docs_per_shard: int = 1, cache: Optional[IndexCache] = None,
+                 workers: int = 0, max_loaded_shards: Optional[int] = None, **retriever_kwargs):
+        """
+        :param workers: processes used to build shards, 0 means one per CPU
+        :param retriever_kwargs: passed to every FaissRetriever, e.g. embedding_model or index_type
+        """
+        directory = directory or ConfigManager().resources_path
+        self.pdf_paths: Dict[str, Path] = {path.stem: path for path in sorted(list_files(str(directory)))
+                                           if path.suffix.lower() == '.pdf'}
+        doc_ids = list(self.pdf_paths)
+        self.shards: List[List[str]] = [doc_ids[i:i + docs_per_shard] for i in range(0, len(doc_ids), docs_per_shard)]
+        self.shard_of: Dict[str, int] = {doc_id: shard_id for shard_id, shard in enumerate(self.shards)
+                                         for doc_id in shard}
+        self.cache = cache or IndexCache()
+        self.max_loaded_shards = max_loaded_shards
+        self.retriever_kwargs = retriever_kwargs
+        self._loaded: OrderedDict[int, Dict[str, FaissRetriever]] = OrderedDict()
+        self.build(workers)
+
+    @property
+    def doc_ids(self) -> List[str]:
+        return list(self.pdf_paths)
+
+    def build(self, workers: int = 0) -> None:
+        if not self.shards:
+            return
+        workers = min(workers or os.cpu_count() or 1, len(self.shards))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_build_shard, [self.pdf_paths[doc_id] for doc_id in shard],
+                                       self.cache.cache_dir, self.cache.max_bytes, self.retriever_kwargs)
+                       for shard in self.shards]
+            chunks = sum(future.result() for future in futures)
+        logger.info(f"Built {len(self.shards)} shards with {chunks} chunks from {len(self.pdf_paths)} PDFs")
+
+    def load_shard(self, shard_id: int) -> Dict[str, FaissRetriever]:
+        if shard_id in self._loaded:
+            self._loaded.move_to_end(shard_id)
+            return self._loaded[shard_id]
+        shard = {doc_id: FaissRetriever(Pdf(self.pdf_paths[doc_id]), cache=self.cache, **self.retriever_kwargs)
+                 for doc_id in self.shards[shard_id]}
+        self._loaded[shard_id] = shard
+        if self.max_loaded_shards is not None:
+            while len(self._loaded) > self.max_loaded_shards:
+                self._loaded.popitem(last=False)
+        return shard
+
+    def retrieve(self, query: str, top_k: int = 5, doc_ids: Optional[Iterable[str]] = None) -> List[Dict]:
+        return self.retrieve_many([query], top_k, doc_ids)[0]
+
+    def retrieve_many(self, queries: List[str], top_k: int = 5,
+                      doc_ids: Optional[Iterable[str]] = None) -> List[List[Dict]]:
+        """
+        Returns, per query, the global ``top_k`` chunks across the selected documents as provenance
+        dicts (see FaissRetriever.provenance) with an additional ``doc_id``.
+        """
+        doc_ids = set(doc_ids) if doc_ids is not None else set(self.pdf_paths)
+        unknown = doc_ids - set(self.pdf_paths)
+        if unknown:
+            raise ValueError(f"Unknown document ids: {sorted(unknown)}")
+        # Filter before searching: only shards holding a requested document are loaded at all
+        shard_ids = sorted({self.shard_of[doc_id] for doc_id in doc_ids})
+        retrievers = [(doc_id, retriever) for shard_id in shard_ids
+                      for doc_id, retriever in self.load_shard(shard_id).items() if doc_id in doc_ids]
+        if not retrievers:
+            return [[] for _ in queries]
+
+        # All shards share one embedding model, so the queries are encoded once
+        query_embeddings = retrievers[0][1].encode(queries)
+        with ThreadPoolExecutor(max_workers=min(len(retrievers), os.cpu_count() or 1)) as executor:
+            searches = list(executor.map(lambda item: item[1].search_ids(query_embeddings, top_k), retrievers))
+
+        results = []
+        for query_num in range(len(queries)):
+            candidates = [(float(distances[query_num][rank]), position, int(indices[query_num][rank]))
+                          for position, (distances, indices) in enumerate(searches)
+                          for rank in range(indices.shape[1]) if indices[query_num][rank] >= 0]
+            merged = []
+            for distance, position, chunk_id in heapq.nsmallest(top_k, candidates):
+                doc_id, retriever = retrievers[position]
+                hit = retriever.provenance(np.array([chunk_id]), np.array([distance]))[0]
+                merged.append({"doc_id": doc_id, **hit})
+            results.append(merged)
+        return results
@@ -1,45 +1,465 @@
+import threading
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
-import pypdf  # Upgraded version of PyPDF2
+from loguru import logger
 
 from artifacts.pdf import Pdf
 from config import ConfigManager
+from retrievers.bm25_index import BM25Index, RetrievalMode, reciprocal_rank_fusion
+from retrievers.chunker import ChunkedPages, TokenChunker, WhitespaceTokenizer
+from retrievers.index_cache import IndexCache
+from retrievers.index_factory import IndexType, build_index, empty_index, enable_reconstruction, set_search_params
+from retrievers.ingestion_pipeline import IngestionPipeline
+from retrievers.mmap_store import MmapStore, StorageMode
+from utils.lazy_import import lazy_import
+from utils.tracing import Tracer, traced
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+faiss = lazy_import("faiss")
+
+
+_models: Dict[str, "SentenceTransformer"] = {}
+_models_lock = threading.Lock()
+
+
+def load_embedding_model(name: str) -> "SentenceTransformer":
+    """
+    Returns the process-wide instance of the embedding model, so that retrievers share one copy.
+    """
+    with _models_lock:
+        if name not in _models:
+            # Imported here: sentence_transformers pulls in torch and transformers
+            from sentence_transformers import SentenceTransformer
+            _models[name] = SentenceTransformer(name)
+        return _models[name]
+
+
+def register_embedding_model(name: str, model) -> None:
+    """
+    Makes ``model`` the process-wide instance for ``name``, e.g. a deterministic fake encoder for offline
+    benchmarks. It needs encode, get_sentence_embedding_dimension, max_seq_length and a fast tokenizer.
+    """
+    with _models_lock:
+        _models[name] = model
+
+
+class ReindexReport(NamedTuple):
+    pages_reused: int
+    pages_changed: int
+    pages_added: int
+    pages_removed: int
+    chunks_removed: int
+    chunks_added: int
 
 
 class FaissRetriever:
     PAGE_SEPARATOR = "\n\n---\n\n"  # Separator for different pages
+    HYBRID_CANDIDATES = 50  # Depth of the dense and lexical rankings fused in hybrid mode
 
-    def __init__(self, pdf: Pdf, embedding_model: Optional[str] = "paraphrase-MiniLM-L6-v2"):
+    def __init__(self, pdf: Pdf, embedding_model: Optional[str] = "paraphrase-MiniLM-L6-v2",
+                 chunk_tokens: Optional[int] = None, chunk_overlap: int = 32, cache: Optional[IndexCache] = None,
+                 index_type: IndexType | str = IndexType.AUTO, nlist: Optional[int] = None,
+                 pq_m: Optional[int] = None, hnsw_m: int = 32, nprobe: Optional[int] = 8,
+                 ef_search: Optional[int] = 64, streaming: bool = False, batch_size: int = 64,
+                 retrieval_mode: RetrievalMode | str = RetrievalMode.DENSE,
+                 storage: StorageMode | str = StorageMode.MEMORY, store_dir: Optional[Path] = None):
+        """
+        :param streaming: index pages in the background as they are extracted; the retriever can be
+            queried right away over the pages indexed so far, see wait_until_indexed
+        :param batch_size: number of chunks embedded per model.encode call when streaming
+        :param retrieval_mode: default for retrieve: dense (FAISS), lexical (BM25, no embedding model
+            needed) or hybrid (both fused with reciprocal rank fusion)
+        :param storage: memory keeps a FAISS index and the chunk strings in process memory; float16 and
+            int8 keep a scalar-quantized FAISS index and the chunk text in memory-mapped files under
+            ``store_dir``, shared by all processes mapping them, and scan the codes without an ANN index
+        """
         self.pdf = pdf
-        self.text = pdf.get_text()
-        self.model = SentenceTransformer(embedding_model)
-        self.chunks: List[str] = self.chunk_text(self.text)
-        self.index = self.prepare_faiss_index(self.chunks, self.model)
+        self.embedding_model = embedding_model
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.cache = cache
+        self.index_type = IndexType(index_type)
+        self.index_params = {"nlist": nlist, "pq_m": pq_m, "hnsw_m": hnsw_m}
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.retrieval_mode = RetrievalMode(retrieval_mode)
+        self.storage = StorageMode(storage)
+        self._bm25: Optional[BM25Index] = None
+        self._text: Optional[str] = None
+        self._model: Optional["SentenceTransformer"] = None
+        self._lock = threading.RLock()
+        self.ingestion: Optional[IngestionPipeline] = None
+        self.page_hashes: List[str] = []
+
+        if self.storage != StorageMode.MEMORY:
+            if streaming:
+                raise ValueError("Streaming ingestion needs the memory storage mode")
+            self._document_hash = None
+            self._open_store(MmapStore(store_dir or ConfigManager().mmap_store_path))
+            return
+
+        document_hash = IndexCache.file_hash(pdf.pdf_path) if cache else None
+        self._document_hash = document_hash
+        cache_key = self._cache_key(document_hash) if cache else None
+        cached = cache.load(cache_key) if cache else None
+        if cached:
+            # Cache hit: no text extraction and no embedding work
+            self.index, self.chunks = cached.index, cached.chunks
+            self.chunk_pages, self.chunk_starts, self.chunk_ends = (
+                cached.arrays["pages"], cached.arrays["starts"], cached.arrays["ends"])
+            self.page_hashes = cached.meta["page_hashes"]
+            # Stored with the index; only rebuilt if an entry lacks it
+            enable_reconstruction(self.index)
+            self.set_search_params(nprobe, ef_search)
+        elif streaming:
+            self._start_streaming(cache_key, document_hash, batch_size)
+        else:
+            self._text = self.pdf.get_text()
+            chunked = self.chunker.chunk_pages(self.pdf.pages)
+            self.chunks: List[str] = chunked.texts
+            # Provenance lives in compact arrays aligned with self.chunks
+            self.chunk_pages, self.chunk_starts, self.chunk_ends = chunked.pages, chunked.starts, chunked.ends
+            self.page_hashes = self.pdf.page_hashes
+            # Chunk positions double as index ids, so chunks can later be removed by id
+            self.index = self.prepare_faiss_index(self.chunks, self.model, self.index_type,
+                                                  nprobe=nprobe, ef_search=ef_search,
+                                                  ids=np.arange(len(self.chunks)), **self.index_params)
+            if cache:
+                self._store_in_cache(cache_key, document_hash)
+
+    def _store_in_cache(self, cache_key: str, document_hash: str) -> None:
+        self.cache.store(cache_key, self.index, self.chunks, {
+            "source": str(self.pdf.pdf_path.resolve()),
+            "document_hash": document_hash,
+            "embedding_model": self.embedding_model,
+            "chunk_tokens": self.chunk_tokens,
+            "chunk_overlap": self.chunk_overlap,
+            "index_type": self.index_type.value,
+            "page_hashes": self.page_hashes,
+        }, {"pages": self.chunk_pages, "starts": self.chunk_starts, "ends": self.chunk_ends})
+
+    def _open_store(self, store: MmapStore) -> None:
+        key = IndexCache.make_key(self.document_id, self.embedding_model, chunk_tokens=self.chunk_tokens,
+                                  chunk_overlap=self.chunk_overlap, storage=self.storage.value)
+        entry = store.open(key)
+        if entry is None:
+            self._text = self.pdf.get_text()
+            chunked = self.chunker.chunk_pages(self.pdf.pages)
+            # The float32 embeddings only exist here; afterwards every process reads the mapped copy
+            entry = store.write(key, self.model.encode(chunked.texts), chunked.texts, self.storage,
+                                {"pages": chunked.pages, "starts": chunked.starts, "ends": chunked.ends},
+                                {"source": str(self.pdf.pdf_path.resolve()), "document_hash": self.document_id,
+                                 "embedding_model": self.embedding_model, "page_hashes": self.pdf.page_hashes})
+        self.index, self.chunks = entry.embeddings, entry.chunks
+        self.chunk_pages, self.chunk_starts, self.chunk_ends = (
+            entry.arrays["pages"], entry.arrays["starts"], entry.arrays["ends"])
+        self.page_hashes = entry.meta["page_hashes"]
+
+    def _start_streaming(self, cache_key: Optional[str], document_hash: Optional[str], batch_size: int) -> None:
+        # The corpus size is unknown up front, so AUTO falls back to exact search
+        index_type = IndexType.FLAT if self.index_type == IndexType.AUTO else self.index_type
+        self.index = empty_index(self.model.get_sentence_embedding_dimension(), index_type,
+                                 self.index_params["hnsw_m"], with_ids=True)
+        set_search_params(self.index, nprobe=self.nprobe, ef_search=self.ef_search)
+        self.chunks = []
+        self.chunk_pages = np.empty(0, dtype='int32')
+        self.chunk_starts = np.empty(0, dtype='int32')
+        self.chunk_ends = np.empty(0, dtype='int32')
+        # Assigned before starting: on a short PDF the pipeline may complete before start() returns
+        self.ingestion = IngestionPipeline(self.pdf, self.chunker, self.model, self._add_batch,
+                                           on_complete=lambda: self._finish_streaming(cache_key, document_hash),
+                                           batch_size=batch_size)
+        self.ingestion.start()
+
+    def _finish_streaming(self, cache_key: Optional[str], document_hash: Optional[str]) -> None:
+        self.page_hashes = list(self.ingestion.page_hashes)
+        if self.cache:
+            self._store_in_cache(cache_key, document_hash)
+
+    def _add_batch(self, batch: ChunkedPages, embeddings: np.ndarray) -> None:
+        with self._lock:
+            self.index.add_with_ids(embeddings, np.arange(len(self.chunks), len(self.chunks) + len(batch.texts)))
+            self.chunks.extend(batch.texts)
+            self.chunk_pages = np.concatenate([self.chunk_pages, batch.pages])
+            self.chunk_starts = np.concatenate([self.chunk_starts, batch.starts])
+            self.chunk_ends = np.concatenate([self.chunk_ends, batch.ends])
+            self._bm25 = None
+
+    def reindex(self, pdf: Pdf) -> ReindexReport:
+        """
+        Moves the retriever to a new version of its document. Pages whose text is unchanged keep
+        their vectors (even if they moved), only new or changed pages are chunked and embedded, and
+        the chunks of pages that no longer exist are removed from the index by id. A page whose
+        number existed before but whose text did not is reported as changed, not as removed and added.
+        """
+        if self.ingestion and not self.ingestion.done:
+            raise RuntimeError("Cannot reindex while streaming ingestion is still running")
+        if self.storage != StorageMode.MEMORY:
+            raise RuntimeError(f"The {self.storage.value} store is read-only; build a new retriever instead")
+        pdf.get_text()
+        new_hashes = pdf.page_hashes
+        old_pages_by_hash: Dict[str, List[int]] = {}
+        for old_page, page_hash in enumerate(self.page_hashes, 1):
+            old_pages_by_hash.setdefault(page_hash, []).append(old_page)
+
+        # Map every unchanged new page to an old page with identical text
+        moved_pages = {}
+        embed_pages = []
+        for new_page, page_hash in enumerate(new_hashes, 1):
+            if old_pages_by_hash.get(page_hash):
+                moved_pages[old_pages_by_hash[page_hash].pop(0)] = new_page
+            else:
+                embed_pages.append(new_page)
+        # The chunks of every old page without a match go, but only leftover page numbers count as removed
+        unmatched_pages = {old_page for old_pages in old_pages_by_hash.values() for old_page in old_pages}
+        changed_pages = [page for page in embed_pages if page in unmatched_pages]
+        pages_removed = len(unmatched_pages) - len(changed_pages)
+
+        with self._lock:
+            removed_ids = np.flatnonzero(np.isin(self.chunk_pages, list(unmatched_pages)))
+            if len(removed_ids):
+                self._remove_ids(removed_ids)
+                self._drop_chunks(removed_ids)
+            # Every remaining chunk is on a page that moved or stayed
+            old_to_new = np.zeros(max(len(self.page_hashes), 1) + 1, dtype='int32')
+            for old_page, new_page in moved_pages.items():
+                old_to_new[old_page] = new_page
+            self.chunk_pages = old_to_new[self.chunk_pages]
+
+            chunked = self.chunker.chunk_pages([pdf.pages[page - 1] for page in embed_pages], embed_pages)
+            if chunked.texts:
+                new_ids = np.arange(len(self.chunks), len(self.chunks) + len(chunked.texts))
+                self.index.add_with_ids(self.encode(chunked.texts), new_ids)
+                self.chunks.extend(chunked.texts)
+                self.chunk_pages = np.concatenate([self.chunk_pages, chunked.pages])
+                self.chunk_starts = np.concatenate([self.chunk_starts, chunked.starts])
+                self.chunk_ends = np.concatenate([self.chunk_ends, chunked.ends])
+
+            self.pdf = pdf
+            self._text = None
+            self._bm25 = None
+            self._document_hash = None
+            self.page_hashes = new_hashes
+
+        report = ReindexReport(pages_reused=len(moved_pages), pages_changed=len(changed_pages),
+                               pages_added=len(embed_pages) - len(changed_pages), pages_removed=pages_removed,
+                               chunks_removed=len(removed_ids), chunks_added=len(chunked.texts))
+        logger.info(f"Reindexed {pdf.pdf_path}: {report.pages_reused} pages reused, {report.pages_changed} changed, "
+                    f"{report.pages_added} added, {report.pages_removed} removed")
+        if self.cache:
+            self._store_in_cache(self._cache_key(self.document_id), self.document_id)
+        return report
+
+    def _drop_chunks(self, ids: np.ndarray) -> None:
+        """
+        Drops the chunks ``ids`` (already removed from the index) and renumbers the remaining chunks
+        densely. The vectors stay where they are; only the id map of the index is rewritten.
+        """
+        live_ids = np.setdiff1d(np.arange(len(self.chunks)), ids)
+        # Live ids are sorted, so the new id of a chunk is its rank among them
+        new_ids = np.searchsorted(live_ids, faiss.vector_to_array(self.index.id_map)).astype('int64')
+        faiss.copy_array_to_vector(new_ids, self.index.id_map)
+        self.index.construct_rev_map()
+        self.chunks = [self.chunks[chunk_id] for chunk_id in live_ids]
+        self.chunk_pages, self.chunk_starts, self.chunk_ends = (
+            self.chunk_pages[live_ids], self.chunk_starts[live_ids], self.chunk_ends[live_ids])
+        self._bm25 = None
+
+    def _remove_ids(self, ids: np.ndarray) -> None:
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            remaining_positions = np.flatnonzero(~np.isin(faiss.vector_to_array(self.index.id_map), ids))
+            # The direct map cannot follow a removal through IndexIDMap2; it is rebuilt below
+            ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+        try:
+            self.index.remove_ids(np.ascontiguousarray(ids, dtype='int64'))
+        except RuntimeError:
+            # HNSW graphs do not support removal: rebuild from the stored vectors, without re-embedding
+            remaining = np.setdiff1d(faiss.vector_to_array(self.index.id_map), ids)
+            vectors = self.index.reconstruct_batch(remaining)
+            index = empty_index(self.index.d, IndexType.HNSW, self.index_params["hnsw_m"], with_ids=True)
+            index.add_with_ids(vectors, remaining)
+            self.index = index
+            set_search_params(self.index, nprobe=self.nprobe, ef_search=self.ef_search)
+        if ivf is not None:
+            # IndexIDMap2 expects the remaining vectors renumbered densely, as a flat index does, but the
+            # inverted lists keep their old positions; renumber them to their rank among the remaining ones
+            for list_no in range(ivf.nlist):
+                size = ivf.invlists.list_size(list_no)
+                if size:
+                    positions = faiss.rev_swig_ptr(ivf.invlists.get_ids(list_no), size)
+                    positions[:] = np.searchsorted(remaining_positions, positions)
+            enable_reconstruction(self.index)
+
+    def wait_until_indexed(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until streaming ingestion has indexed every page. Returns False on timeout.
+        """
+        return self.ingestion.join(timeout) if self.ingestion else True
+
+    @property
+    def indexed_pages(self) -> int:
+        return self.ingestion.pages_indexed if self.ingestion else self.pdf.page_count
+
+    @property
+    def document_id(self) -> str:
+        # Content hash of the PDF, stable across processes and paths
+        if self._document_hash is None:
+            self._document_hash = IndexCache.file_hash(self.pdf.pdf_path)
+        return self._document_hash
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.pdf.get_text()
+        return self._text
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        # Loaded on first use so that cache hits do not pay for model initialisation
+        if self._model is None:
+            self._model = load_embedding_model(self.embedding_model)
+        return self._model
+
+    @property
+    def bm25(self) -> BM25Index:
+        # Built on first lexical query from the chunks alone, so cache hits never need the model for it
+        with self._lock:
+            if self._bm25 is None:
+                self._bm25 = BM25Index(self.chunks)
+                logger.info(f"Built BM25 index over {len(self.chunks)} chunks "
+                            f"({self._bm25.memory_bytes() / 1024 ** 2:.1f} MB)")
+            return self._bm25
+
+    @property
+    def chunker(self) -> TokenChunker:
+        # Never exceed what the embedding model can see, otherwise the tail of a chunk is dropped
+        max_tokens = self.model.max_seq_length - self.model.tokenizer.num_special_tokens_to_add()
+        chunk_tokens = min(self.chunk_tokens or max_tokens, max_tokens)
+        return TokenChunker(self.model.tokenizer, chunk_tokens, min(self.chunk_overlap, chunk_tokens - 1))
+
+    def _cache_key(self, document_hash: str) -> str:
+        return IndexCache.make_key(document_hash, self.embedding_model, chunk_tokens=self.chunk_tokens,
+                                   chunk_overlap=self.chunk_overlap,
+                                   index_type=self.index_type.value, **self.index_params)
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+        """
+        Tunes recall against latency: ``nprobe`` for IVF indexes, ``ef_search`` for HNSW.
+        """
+        self.nprobe = nprobe if nprobe is not None else self.nprobe
+        self.ef_search = ef_search if ef_search is not None else self.ef_search
+        if self.storage != StorageMode.MEMORY:
+            # Mapped stores are searched exactly, there is nothing to tune
+            return
+        set_search_params(self.index, nprobe=self.nprobe, ef_search=self.ef_search)
 
     @staticmethod
-    def chunk_text(text: str, chunk_size: int = 300) -> List[str]:
-        # Split the extracted text into chunks of specified chunk_size
-        words = text.split()
-        chunks = [' '.join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size)]
-        return chunks
+    def chunk_text(text: str, chunk_size: int = 300, tokenizer=None, overlap: int = 0) -> List[str]:
+        """
+        Splits ``text`` into windows of ``chunk_size`` tokens with TokenChunker, ignoring pages. Without a
+        fast ``tokenizer`` the tokens are whitespace-separated words.
+        """
+        return TokenChunker(tokenizer or WhitespaceTokenizer(), chunk_size, overlap).chunk_page(text)[0]
 
     @staticmethod
-    def prepare_faiss_index(chunks: List[str], embedding_model):
+    def prepare_faiss_index(chunks: List[str], embedding_model, index_type: IndexType = IndexType.AUTO,
+                            **index_params):
         # Generate embeddings for each chunk
         embeddings = embedding_model.encode(chunks)
 
-        # Create FAISS index and add embeddings
-        dimension = embeddings.shape[1]
-        index = faiss.IndexFlatL2(dimension)
-        index.add(embeddings)
-        return index
+        # Create the FAISS index (trained if the type needs it) and add embeddings
+        return build_index(embeddings, index_type, **index_params)
+
+    @traced("retriever.encode")
+    def encode(self, queries: List[str], batch_size: int = 64) -> np.ndarray:
+        # One batched forward pass for all queries
+        return np.ascontiguousarray(self.model.encode(queries, batch_size=batch_size), dtype='float32')
+
+    @traced("retriever.search")
+    def search_ids(self, query_embeddings: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Raw index search returning (distances, chunk ids). Ids of -1 pad rows with fewer than top_k hits.
+        """
+        with self._lock:
+            return self.index.search(query_embeddings, top_k)
+
+    def query_ids(self, queries: List[str], top_k: int = 5, mode: Optional[RetrievalMode | str] = None,
+                  query_embeddings: Optional[np.ndarray] = None,
+                  batch_size: int = 64) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search in the given mode (retrieval_mode by default) returning (scores, chunk ids), best first.
+        Scores are L2 distances in dense mode, BM25 scores in lexical mode and fused RRF scores in hybrid
+        mode. ``query_embeddings`` saves the encode when the caller already has them.
+        """
+        mode = RetrievalMode(mode or self.retrieval_mode)
+        if mode == RetrievalMode.LEXICAL:
+            with Tracer().span("retriever.lexical_search"):
+                return self.bm25.search(queries, top_k)
+        if query_embeddings is None:
+            query_embeddings = self.encode(queries, batch_size)
+        if mode == RetrievalMode.DENSE:
+            return self.search_ids(query_embeddings, top_k)
+        depth = max(top_k, FaissRetriever.HYBRID_CANDIDATES)
+        _, dense_ids = self.search_ids(query_embeddings, depth)
+        with Tracer().span("retriever.lexical_search"):
+            _, lexical_ids = self.bm25.search(queries, depth)
+        return reciprocal_rank_fusion([dense_ids, lexical_ids], top_k)
 
-    def retrieve(self, query: str, top_k: int = 5) -> List[str]:
+    def search(self, query_embeddings: np.ndarray, top_k: int = 5) -> Tuple[List[List[str]], np.ndarray]:
+        distances, indices = self.search_ids(query_embeddings, top_k)
+        # Approximate indexes, and partially streamed ones, pad with -1 when fewer than top_k are found
+        results = [[self.chunks[idx] for idx in row if idx >= 0] for row in indices]
+        return results, distances
+
+    def chunk_embeddings(self, ids: np.ndarray) -> np.ndarray:
+        """
+        Embeddings of the given chunk ids, read back from the index (IVF-PQ returns its approximate
+        decoded vectors). An index that cannot reconstruct its vectors, such as an IVF index built
+        without ids, falls back to encoding the chunk texts again.
+        """
+        ids = np.ascontiguousarray(ids, dtype='int64')
+        try:
+            with self._lock:
+                return self.index.reconstruct_batch(ids)
+        except RuntimeError:
+            return self.encode([self.chunks[idx] for idx in ids])
+
+    def retrieve(self, query: str, top_k: int = 5, mode: Optional[RetrievalMode | str] = None) -> List[str]:
         # Generate embedding for the query and search for the most similar chunks
-        query_embedding = self.model.encode([query])
-        distances, indices = self.index.search(query_embedding, top_k)
-        results = [self.chunks[idx] for idx in indices[0]]
-        return results
+        results, _ = self.retrieve_many([query], top_k, mode=mode)
+        return results[0]
+
+    @traced("retriever.retrieve")
+    def retrieve_many(self, queries: List[str], top_k: int = 5, batch_size: int = 64,
+                      mode: Optional[RetrievalMode | str] = None) -> Tuple[List[List[str]], np.ndarray]:
+        """
+        Retrieves the ``top_k`` chunks for every query with a single encode and a single index search.
+        Returns the chunks per query and the (len(queries), top_k) score matrix, see query_ids.
+        """
+        scores, indices = self.query_ids(queries, top_k, mode, batch_size=batch_size)
+        results = [[self.chunks[idx] for idx in row if idx >= 0] for row in indices]
+        tracer = Tracer()
+        if tracer.enabled:
+            for result in results:
+                tracer.observe("retriever.chunks_returned", len(result))
+        return results, scores
+
+    def retrieve_with_provenance(self, query: str, top_k: int = 5) -> List[Dict]:
+        """
+        Like retrieve, but every result also carries its chunk id, distance, 1-based page number
+        and character span within that page.
+        """
+        distances, indices = self.search_ids(self.encode([query]), top_k)
+        return self.provenance(indices[0], distances[0])
+
+    def provenance(self, ids: np.ndarray, distances: np.ndarray) -> List[Dict]:
+        found = ids >= 0
+        ids, distances = ids[found], distances[found]
+        pages, starts, ends = self.chunk_pages[ids], self.chunk_starts[ids], self.chunk_ends[ids]
+        return [{"id": int(ids[i]), "text": self.chunks[ids[i]], "distance": float(distances[i]),
+                 "page": int(pages[i]), "start": int(starts[i]), "end": int(ends[i])}
+                for i in range(len(ids))]
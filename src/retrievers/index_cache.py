@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from config import ConfigManager
+from utils.lazy_import import lazy_import
+
+faiss = lazy_import("faiss")
+
+
+class CacheEntry(NamedTuple):
+    index: "faiss.Index"
+    chunks: List[str]
+    meta: dict
+    arrays: Dict[str, np.ndarray]
+
+
+class IndexCache:
+    """
+    On-disk cache of built FAISS indexes, their chunks, per-chunk arrays and metadata.
+
+    Each entry lives in its own directory named after the cache key. The key covers the
+    document content hash, the embedding model and the chunking parameters, so a changed
+    PDF or different settings never hit an old entry. Entries are evicted least recently
+    used first once the cache grows beyond ``max_bytes``.
+    """
+    FORMAT_VERSION = 4
+    INDEX_FILE = "index.faiss"
+    CHUNKS_FILE = "chunks.json"
+    ARRAYS_FILE = "arrays.npz"
+    META_FILE = "meta.json"
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or ConfigManager().index_cache_path
+        self.max_bytes = max_bytes if max_bytes is not None else ConfigManager().index_cache_max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def file_hash(path: Path, block_size: int = 1 << 20) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(block_size), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(document_hash: str, embedding_model: str, **params) -> str:
+        payload = json.dumps({
+            "version": IndexCache.FORMAT_VERSION,
+            "document": document_hash,
+            "embedding_model": embedding_model,
+            "params": params,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def load(self, key: str) -> Optional[CacheEntry]:
+        entry = self.cache_dir / key
+        if not (entry / IndexCache.META_FILE).exists():
+            return None
+        try:
+            meta = json.loads((entry / IndexCache.META_FILE).read_text(encoding='utf-8'))
+            if meta.get("version") != IndexCache.FORMAT_VERSION:
+                raise ValueError(f"unsupported cache format {meta.get('version')}")
+            index = faiss.read_index(str(entry / IndexCache.INDEX_FILE))
+            chunks = json.loads((entry / IndexCache.CHUNKS_FILE).read_text(encoding='utf-8'))
+            if index.ntotal != len(chunks):
+                raise ValueError(f"index holds {index.ntotal} vectors for {len(chunks)} chunks")
+            with np.load(entry / IndexCache.ARRAYS_FILE) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        except Exception as e:
+            logger.warning(f"Dropping corrupt index cache entry {key}: {e}")
+            self._remove(entry)
+            return None
+        os.utime(entry / IndexCache.META_FILE)
+        logger.info(f"Loaded FAISS index for {meta.get('source')} from cache")
+        return CacheEntry(index, chunks, meta, arrays)
+
+    def store(self, key: str, index: "faiss.Index", chunks: List[str], meta: dict,
+              arrays: Optional[Dict[str, np.ndarray]] = None) -> None:
+        entry = self.cache_dir / key
+        tmp_entry = self.cache_dir / f".{key}.{os.getpid()}.tmp"
+        self._remove(tmp_entry)
+        tmp_entry.mkdir(parents=True)
+        try:
+            faiss.write_index(index, str(tmp_entry / IndexCache.INDEX_FILE))
+            (tmp_entry / IndexCache.CHUNKS_FILE).write_text(json.dumps(chunks), encoding='utf-8')
+            np.savez(tmp_entry / IndexCache.ARRAYS_FILE, **(arrays or {}))
+            meta = {**meta, "version": IndexCache.FORMAT_VERSION, "created_at": time.time()}
+            (tmp_entry / IndexCache.META_FILE).write_text(json.dumps(meta), encoding='utf-8')
+            self._remove(entry)
+            tmp_entry.rename(entry)
+        finally:
+            self._remove(tmp_entry)
+        if meta.get("source") and meta.get("document_hash"):
+            # Without a hash invalidate would remove every entry of the source, this one included
+            self.invalidate(meta["source"], current_hash=meta["document_hash"])
+        self._evict(keep=key)
+
+    def invalidate(self, source: str, current_hash: Optional[str] = None) -> int:
+        """
+        Removes the cached entries built from ``source`` whose document hash differs from
+        ``current_hash`` (all of them if no hash is given). Returns the number removed.
+        """
+        removed = 0
+        for entry, meta in self._entries():
+            if meta.get("source") == source and (current_hash is None or meta.get("document_hash") != current_hash):
+                logger.info(f"Invalidating stale index cache entry {entry.name} for {source}")
+                self._remove(entry)
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        for entry, _ in self._entries():
+            self._remove(entry)
+
+    def size_bytes(self) -> int:
+        return sum(self._entry_size(entry) for entry, _ in self._entries())
+
+    def _entries(self) -> List[Tuple[Path, dict]]:
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            meta_file = entry / IndexCache.META_FILE
+            if entry.name.startswith('.') or not meta_file.exists():
+                continue
+            try:
+                entries.append((entry, json.loads(meta_file.read_text(encoding='utf-8'))))
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError):
+                entries.append((entry, {}))
+        return entries
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        entries = []
+        for entry, _ in self._entries():
+            try:
+                entries.append((entry, self._entry_size(entry), (entry / IndexCache.META_FILE).stat().st_mtime))
+            except FileNotFoundError:
+                # Removed concurrently by another process sharing the cache directory
+                continue
+        total = sum(size for _, size, _ in entries)
+        for entry, size, _ in sorted(entries, key=lambda item: item[2]):
+            if total <= self.max_bytes:
+                break
+            if entry.name == keep:
+                continue
+            logger.info(f"Evicting index cache entry {entry.name} ({size} bytes)")
+            self._remove(entry)
+            total -= size
+
+    @staticmethod
+    def _entry_size(entry: Path) -> int:
+        return sum(file.stat().st_size for file in entry.iterdir() if file.is_file())
+
+    @staticmethod
+    def _remove(entry: Path) -> None:
+        if entry.exists():
+            shutil.rmtree(entry, ignore_errors=True)
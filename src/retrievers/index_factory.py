@@ -0,0 +1,146 @@
+from enum import Enum
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+
+from utils.lazy_import import lazy_import
+
+faiss = lazy_import("faiss")
+
+
+class IndexType(Enum):
+    AUTO = "auto"
+    FLAT = "flat"
+    IVF_FLAT = "ivf_flat"
+    IVF_PQ = "ivf_pq"
+    HNSW = "hnsw"
+
+    @staticmethod
+    def choose(num_vectors: int) -> "IndexType":
+        """
+        Picks an index type for a corpus of ``num_vectors`` embeddings. Exact search is cheap
+        for a handful of documents, HNSW gives the best latency for mid-sized corpora and the
+        IVF variants keep build time and memory in check for large ones.
+        """
+        if num_vectors < 10_000:
+            return IndexType.FLAT
+        if num_vectors < 100_000:
+            return IndexType.HNSW
+        if num_vectors < 1_000_000:
+            return IndexType.IVF_FLAT
+        return IndexType.IVF_PQ
+
+
+def default_nlist(num_vectors: int) -> int:
+    # FAISS wants roughly 39 training points per centroid
+    return int(max(1, min(4 * np.sqrt(num_vectors), num_vectors // 39)))
+
+
+def default_pq_m(dimension: int) -> int:
+    # Largest number of sub-quantizers that divides the dimension with at least 8 dims each
+    for m in range(max(1, dimension // 8), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def build_index(embeddings: np.ndarray, index_type: IndexType = IndexType.AUTO, nlist: Optional[int] = None,
+                pq_m: Optional[int] = None, hnsw_m: int = 32, nprobe: Optional[int] = None,
+                ef_search: Optional[int] = None, ids: Optional[np.ndarray] = None) -> "faiss.Index":
+    """
+    Builds, trains and fills an index. With ``ids`` the index is wrapped in an IndexIDMap2 so that
+    vectors can later be removed or reconstructed by id; IVF indexes get a direct map for the latter.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    num_vectors, dimension = embeddings.shape
+    if index_type == IndexType.AUTO:
+        index_type = IndexType.choose(num_vectors)
+
+    if index_type in (IndexType.FLAT, IndexType.HNSW):
+        index = empty_index(dimension, index_type, hnsw_m)
+    elif index_type in (IndexType.IVF_FLAT, IndexType.IVF_PQ):
+        nlist = nlist or default_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == IndexType.IVF_FLAT:
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            pq_m = pq_m or default_pq_m(dimension)
+            # 8-bit codes need 256 centroids per sub-quantizer; shrink them for small training sets
+            nbits = int(min(8, max(1, np.log2(max(2, num_vectors // 39)))))
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, nbits)
+    else:
+        raise ValueError(f"Unsupported index type {index_type}")
+
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+    if not index.is_trained:
+        logger.info(f"Training {index_type.value} index on {num_vectors} vectors")
+        index.train(embeddings)
+    if ids is not None:
+        index.add_with_ids(embeddings, np.ascontiguousarray(ids, dtype='int64'))
+        enable_reconstruction(index)
+    else:
+        index.add(embeddings)
+    set_search_params(index, nprobe=nprobe, ef_search=ef_search)
+    return index
+
+
+def empty_index(dimension: int, index_type: IndexType = IndexType.FLAT, hnsw_m: int = 32,
+                with_ids: bool = False) -> "faiss.Index":
+    """
+    Creates an index that accepts vectors incrementally without a training step.
+    """
+    if index_type == IndexType.FLAT:
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == IndexType.HNSW:
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+    else:
+        raise ValueError(f"{index_type.value} indexes need training data and cannot be filled incrementally")
+    return faiss.IndexIDMap2(index) if with_ids else index
+
+
+def enable_reconstruction(index: "faiss.Index") -> None:
+    """
+    Gives an IVF index a direct map from vector positions to inverted list entries, so that its vectors
+    can be reconstructed by id like those of the other index types. Does nothing for other types.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.set_direct_map_type(faiss.DirectMap.Array)
+
+
+def set_search_params(index: "faiss.Index", nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+    """
+    Applies the search-time knobs to ``index`` where they are applicable and ignores them otherwise.
+    """
+    if nprobe is not None:
+        try:
+            ivf = faiss.extract_index_ivf(index)
+            ivf.nprobe = min(nprobe, ivf.nlist)
+        except RuntimeError:
+            pass
+    if ef_search is not None:
+        inner = _inner_index(index)
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efSearch = ef_search
+
+
+def index_type_of(index: "faiss.Index") -> IndexType:
+    inner = _inner_index(index)
+    if isinstance(inner, faiss.IndexHNSW):
+        return IndexType.HNSW
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return IndexType.IVF_PQ
+    if isinstance(inner, faiss.IndexIVF):
+        return IndexType.IVF_FLAT
+    return IndexType.FLAT
+
+
+def _inner_index(index: "faiss.Index") -> "faiss.Index":
+    # Looks through an IndexIDMap wrapper at the index doing the actual search
+    return faiss.downcast_index(index.index) if hasattr(index, "id_map") else faiss.downcast_index(index)
+
+
+def index_memory_bytes(index: "faiss.Index") -> int:
+    return int(faiss.serialize_index(index).nbytes)
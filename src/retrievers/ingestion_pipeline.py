@@ -0,0 +1,145 @@
+import queue
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from artifacts.pdf import Pdf
+from retrievers.chunker import ChunkedPages, TokenChunker
+
+
+class IngestionPipeline:
+    """
+    Streams a PDF into an index through three threads connected by bounded queues:
+
+        extraction (page by page) -> chunking (fixed-size batches) -> embedding -> on_batch
+
+    Extraction, tokenization and encoding overlap, and only ``queue_size`` pages and batches are
+    ever held in memory besides what ``on_batch`` keeps.
+    """
+    _DONE = object()
+
+    def __init__(self, pdf: Pdf, chunker: TokenChunker, model,
+                 on_batch: Callable[[ChunkedPages, np.ndarray], None],
+                 on_complete: Optional[Callable[[], None]] = None,
+                 batch_size: int = 64, queue_size: int = 8):
+        self.pdf = pdf
+        self.chunker = chunker
+        self.model = model
+        self.on_batch = on_batch
+        self.on_complete = on_complete
+        self.batch_size = batch_size
+        self.pages_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.batches_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.pages_indexed = 0
+        self.page_hashes: List[str] = []
+        self.chunks_indexed = 0
+        self.error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> "IngestionPipeline":
+        self._threads = [
+            threading.Thread(target=self._run, args=(self._extract,), name="ingest-extract", daemon=True),
+            threading.Thread(target=self._run, args=(self._chunk,), name="ingest-chunk", daemon=True),
+            threading.Thread(target=self._run, args=(self._embed,), name="ingest-embed", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    @property
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for the pipeline to drain. Returns False on timeout and re-raises a stage failure.
+        """
+        finished = self._finished.wait(timeout)
+        if self.error is not None:
+            raise RuntimeError(f"Ingestion of {self.pdf.pdf_path} failed: {self.error}") from self.error
+        return finished
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._finished.set()
+
+    def _run(self, stage: Callable[[], None]) -> None:
+        try:
+            stage()
+        except BaseException as e:
+            logger.error(f"Ingestion stage {threading.current_thread().name} failed: {e}")
+            self.error = e
+            self._stop.set()
+            self._finished.set()
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        # Bounded put that gives up once another stage has failed or stop() was called
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source: queue.Queue):
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return IngestionPipeline._DONE
+
+    def _extract(self) -> None:
+        # Text is handed downstream instead of being kept on the Pdf
+        for page_num, page_text in self.pdf.iter_pages(memoize=False):
+            self.page_hashes.append(Pdf.hash_page(page_text))
+            if not self._put(self.pages_queue, (page_num, page_text)):
+                return
+        self._put(self.pages_queue, IngestionPipeline._DONE)
+
+    def _chunk(self) -> None:
+        texts, pages, starts, ends = [], [], [], []
+        while (item := self._get(self.pages_queue)) is not IngestionPipeline._DONE:
+            page_num, page_text = item
+            page_chunks, page_starts, page_ends = self.chunker.chunk_page(page_text)
+            texts.extend(page_chunks)
+            pages.extend([page_num] * len(page_chunks))
+            starts.extend(page_starts)
+            ends.extend(page_ends)
+            while len(texts) >= self.batch_size:
+                batch = self._batch(texts[:self.batch_size], pages[:self.batch_size],
+                                    starts[:self.batch_size], ends[:self.batch_size])
+                del texts[:self.batch_size], pages[:self.batch_size], starts[:self.batch_size], ends[:self.batch_size]
+                if not self._put(self.batches_queue, batch):
+                    return
+        if self._stop.is_set():
+            return
+        if texts:
+            self._put(self.batches_queue, self._batch(texts, pages, starts, ends))
+        self._put(self.batches_queue, IngestionPipeline._DONE)
+
+    def _embed(self) -> None:
+        while (batch := self._get(self.batches_queue)) is not IngestionPipeline._DONE:
+            embeddings = np.ascontiguousarray(self.model.encode(batch.texts, batch_size=self.batch_size),
+                                              dtype='float32')
+            self.on_batch(batch, embeddings)
+            self.chunks_indexed += len(batch.texts)
+            # The last page of a batch may continue in the next one
+            self.pages_indexed = int(batch.pages[-1]) - 1
+        if self._stop.is_set():
+            return
+        self.pages_indexed = self.pdf.page_count
+        if self.on_complete:
+            self.on_complete()
+        logger.info(f"Streamed {self.chunks_indexed} chunks of {self.pdf.pdf_path} into the index")
+        self._finished.set()
+
+    @staticmethod
+    def _batch(texts: List[str], pages: List[int], starts: List[int], ends: List[int]) -> ChunkedPages:
+        return ChunkedPages(list(texts), np.array(pages, dtype='int32'),
+                            np.array(starts, dtype='int32'), np.array(ends, dtype='int32'))
@@ -0,0 +1,161 @@
+import json
+import mmap
+import os
+import shutil
+from collections.abc import Sequence
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+from loguru import logger
+
+from utils.lazy_import import lazy_import
+
+faiss = lazy_import("faiss")
+
+
+class StorageMode(Enum):
+    MEMORY = "memory"  # float32 FAISS index and chunk strings in process memory
+    FLOAT16 = "float16"
+    INT8 = "int8"  # per-dimension scalar quantization
+
+
+class MmapChunks(Sequence):
+    """
+    Read-only list of chunk strings backed by one UTF-8 blob and an offsets array, both memory-mapped.
+    Chunk ``i`` is ``blob[offsets[i]:offsets[i + 1]]``, decoded on access.
+    """
+
+    def __init__(self, blob_path: Path, offsets_path: Path):
+        self.offsets = np.load(offsets_path, mmap_mode='r')
+        with open(blob_path, 'rb') as file:
+            # mmap refuses empty files
+            self._blob = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size \
+                else b""
+
+    @staticmethod
+    def write(chunks: List[str], blob_path: Path, offsets_path: Path) -> None:
+        encoded = [chunk.encode('utf-8') for chunk in chunks]
+        offsets = np.zeros(len(encoded) + 1, dtype='int64')
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        with open(blob_path, 'wb') as file:
+            for data in encoded:
+                file.write(data)
+        np.save(offsets_path, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(f"chunk {idx} out of range")
+        return self._blob[int(self.offsets[idx]):int(self.offsets[idx + 1])].decode('utf-8')
+
+
+class MmapEmbeddings:
+    """
+    Scalar-quantized FAISS index (float16 or per-dimension int8 codes) whose codes are memory-mapped
+    in place rather than read into process memory. FAISS searches the codes directly, exactly, and
+    the mapped pages are shared by every process that opens the same file.
+    """
+    INDEX_FILE = "index.faiss"
+    QUANTIZERS = {
+        StorageMode.FLOAT16: "QT_fp16",
+        StorageMode.INT8: "QT_8bit",  # per-dimension min/max trained on the embeddings
+    }
+
+    @staticmethod
+    def write(embeddings: np.ndarray, mode: StorageMode, directory: Path) -> None:
+        if mode not in MmapEmbeddings.QUANTIZERS:
+            raise ValueError(f"{mode.value} is not a memory-mapped storage mode")
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        index = faiss.IndexScalarQuantizer(embeddings.shape[1],
+                                           getattr(faiss.ScalarQuantizer, MmapEmbeddings.QUANTIZERS[mode]))
+        # The int8 ranges are trained on the vectors themselves; FAISS refuses to train on none
+        index.train(embeddings if len(embeddings) else np.zeros((1, embeddings.shape[1]), dtype='float32'))
+        index.add(embeddings)
+        faiss.write_index(index, str(directory / MmapEmbeddings.INDEX_FILE))
+
+    @staticmethod
+    def open(directory: Path) -> "faiss.Index":
+        # The mapped index is read-only: adding to it aborts inside FAISS
+        return faiss.read_index(str(directory / MmapEmbeddings.INDEX_FILE),
+                                faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+
+
+class StoreEntry(NamedTuple):
+    embeddings: "faiss.Index"
+    chunks: MmapChunks
+    arrays: Dict[str, np.ndarray]
+    meta: dict
+
+
+class MmapStore:
+    """
+    Directory of memory-mapped files for one document: quantized FAISS index, chunk blob and offsets,
+    and the per-chunk provenance arrays. Entries are written to a temporary directory and renamed into
+    place, so a reader never maps a half-written entry.
+    """
+    BLOB_FILE = "chunks.bin"
+    OFFSETS_FILE = "chunk_offsets.npy"
+    META_FILE = "meta.json"
+
+    def __init__(self, store_dir: Path):
+        self.store_dir = store_dir
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    def open(self, key: str) -> Optional[StoreEntry]:
+        entry = self.store_dir / key
+        if not (entry / MmapStore.META_FILE).exists():
+            return None
+        try:
+            meta = json.loads((entry / MmapStore.META_FILE).read_text(encoding='utf-8'))
+            index = MmapEmbeddings.open(entry)
+            chunks = MmapChunks(entry / MmapStore.BLOB_FILE, entry / MmapStore.OFFSETS_FILE)
+            if index.ntotal != len(chunks):
+                raise ValueError(f"index holds {index.ntotal} vectors for {len(chunks)} chunks")
+            arrays = {name: np.load(entry / f"{name}.npy", mmap_mode='r') for name in meta["arrays"]}
+        except Exception as e:
+            logger.warning(f"Dropping corrupt embedding store {key}: {e}")
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        logger.info(f"Mapped {meta['storage']} embedding store for {meta.get('source')}")
+        return StoreEntry(index, chunks, arrays, meta)
+
+    def write(self, key: str, embeddings: np.ndarray, chunks: List[str], mode: StorageMode,
+              arrays: Dict[str, np.ndarray], meta: dict) -> StoreEntry:
+        entry = self.store_dir / key
+        tmp_entry = self.store_dir / f".{key}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        tmp_entry.mkdir(parents=True)
+        try:
+            MmapEmbeddings.write(embeddings, mode, tmp_entry)
+            MmapChunks.write(chunks, tmp_entry / MmapStore.BLOB_FILE, tmp_entry / MmapStore.OFFSETS_FILE)
+            for name, array in arrays.items():
+                np.save(tmp_entry / f"{name}.npy", array)
+            meta = {**meta, "storage": mode.value, "arrays": list(arrays)}
+            (tmp_entry / MmapStore.META_FILE).write_text(json.dumps(meta), encoding='utf-8')
+            shutil.rmtree(entry, ignore_errors=True)
+            tmp_entry.rename(entry)
+        finally:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        if meta.get("source"):
+            self.invalidate(meta["source"], meta.get("document_hash"))
+        return self.open(key)
+
+    def invalidate(self, source: str, current_hash: Optional[str]) -> None:
+        # Entries of older versions of the document would otherwise stay on disk forever
+        for entry in self.store_dir.iterdir():
+            meta_file = entry / MmapStore.META_FILE
+            if entry.name.startswith('.') or not meta_file.exists():
+                continue
+            meta = json.loads(meta_file.read_text(encoding='utf-8'))
+            if meta.get("source") == source and meta.get("document_hash") != current_hash:
+                logger.info(f"Removing stale embedding store {entry.name} for {source}")
+                shutil.rmtree(entry, ignore_errors=True)
@@ -0,0 +1,267 @@
+"""
+Long-running question answering server. The retriever and the chat model are loaded once and stay
+warm; questions from all connections are coalesced into micro-batches, so query embedding, FAISS
+search and (for the local model) generation run batched.
+
+The protocol is JSON lines over TCP. Send ``{"id": 1, "question": "..."}`` and receive
+``{"id": 1, "answer": "..."}``; answers of one connection may arrive out of order. ``{"command": "stats"}``
+returns the queue depth and batch size statistics. Run from the ``src`` directory:
+
+    python -m server --chat local --port 8765
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from loguru import logger
+
+from config import ConfigManager
+from utils.tracing import Tracer
+
+
+class BatcherStats:
+
+    def __init__(self):
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.batch_sizes: Counter = Counter()
+        self.max_queue_depth = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def mean_batch_size(self) -> Optional[float]:
+        return sum(size * count for size, count in self.batch_sizes.items()) / self.batches if self.batches else None
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "mean_batch_size": self.mean_batch_size,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "max_queue_depth": self.max_queue_depth,
+            "busy_seconds": self.busy_seconds,
+        }
+
+
+class MicroBatcher:
+    """
+    Collects questions in a bounded queue and answers them in batches. A batch starts with the
+    oldest waiting question and takes everything that arrives within ``batch_window`` seconds, up
+    to ``max_batch_size`` questions. When the queue is full, enqueue waits, which stops reading
+    from the client connection and so pushes back on the clients.
+    """
+
+    def __init__(self, answer_many: Callable[[List[str]], Awaitable[List[str]]], max_batch_size: int = 16,
+                 batch_window: float = 0.01, max_queue_size: int = 256, workers: int = 1):
+        """
+        :param answer_many: coroutine function answering a list of questions in order
+        :param workers: batches answered concurrently; 1 for a local model, more for a remote API
+        """
+        self.answer_many = answer_many
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.queue: asyncio.Queue[Tuple[str, asyncio.Future]] = asyncio.Queue(maxsize=max_queue_size)
+        self.workers = workers
+        self.stats = BatcherStats()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def enqueue(self, question: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((question, future))
+        self.stats.requests += 1
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.queue_depth)
+        Tracer().observe("server.queue_depth", self.queue_depth)
+        return future
+
+    async def ask(self, question: str) -> str:
+        return await (await self.enqueue(question))
+
+    async def _next_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Whatever is already waiting still joins the batch
+                if self.queue.empty():
+                    break
+                batch.append(self.queue.get_nowait())
+                continue
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _work(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            # Clients that disconnected meanwhile need no answer
+            batch = [(question, future) for question, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+            self.stats.batches += 1
+            self.stats.batch_sizes[len(batch)] += 1
+            Tracer().observe("server.batch_size", len(batch))
+            start = time.perf_counter()
+            try:
+                answers = await self.answer_many([question for question, _ in batch])
+            except Exception as e:
+                self.stats.errors += 1
+                logger.error(f"Answering a batch of {len(batch)} questions failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), answer in zip(batch, answers):
+                    if not future.done():
+                        future.set_result(answer)
+            finally:
+                self.stats.busy_seconds += time.perf_counter() - start
+
+
+def batch_answerer(chat) -> Callable[[List[str]], Awaitable[List[str]]]:
+    """
+    aask_many where the chat has it (concurrent API calls), otherwise the blocking ask_many in a
+    worker thread so the event loop keeps collecting the next batch meanwhile.
+    """
+    if hasattr(chat, "aask_many"):
+        return chat.aask_many
+
+    async def answer_many(questions: List[str]) -> List[str]:
+        return await asyncio.to_thread(chat.ask_many, questions)
+    return answer_many
+
+
+class QueryServer:
+
+    def __init__(self, batcher: MicroBatcher):
+        self.batcher = batcher
+
+    def stats(self) -> dict:
+        return {"queue_depth": self.batcher.queue_depth, **self.batcher.stats.as_dict()}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def send(message: dict) -> None:
+            async with lock:
+                writer.write((json.dumps(message) + "\n").encode('utf-8'))
+                await writer.drain()
+
+        async def answer(request_id, future: asyncio.Future) -> None:
+            try:
+                message = {"id": request_id, "answer": await future}
+            except Exception as e:
+                message = {"id": request_id, "error": str(e)}
+            try:
+                await send(message)
+            except ConnectionError:
+                pass
+
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    await send({"error": f"invalid JSON: {e}"})
+                    continue
+                if not isinstance(request, dict):
+                    await send({"error": "expected a JSON object"})
+                    continue
+                if request.get("command") == "stats":
+                    await send({"id": request.get("id"), "stats": self.stats()})
+                elif isinstance(request.get("question"), str):
+                    # Waits while the queue is full, so no further lines are read from this client
+                    future = await self.batcher.enqueue(request["question"])
+                    task = asyncio.create_task(answer(request.get("id"), future))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                else:
+                    await send({"id": request.get("id"), "error": "expected a question or a command"})
+            await asyncio.gather(*pending)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logger.info(f"Client disconnected: {e}")
+        finally:
+            for task in pending:
+                task.cancel()
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle, host, port)
+        logger.info(f"Serving questions on {host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+
+def build_chat(kind: str):
+    from artifacts.pdf import Pdf
+    from retrievers.faiss_retriever import FaissRetriever
+    from retrievers.index_cache import IndexCache
+
+    retriever = FaissRetriever(Pdf(ConfigManager().pdf_file_path), cache=IndexCache())
+    if kind == "openai":
+        from chat.rag_chat import RagChat
+        return RagChat(retriever)
+    from chat.local_rag_chat import LocalRagChat
+    chat = LocalRagChat(retriever)
+    # Load the model now rather than on the first question
+    chat.base_model
+    return chat
+
+
+def main():
+    config = ConfigManager()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat", choices=["local", "openai"], default="local")
+    parser.add_argument("--host", type=str, default=config.server_host)
+    parser.add_argument("--port", type=int, default=config.server_port)
+    parser.add_argument("--max-batch-size", type=int, default=config.server_max_batch_size)
+    parser.add_argument("--batch-window-ms", type=float, default=config.server_batch_window_ms)
+    parser.add_argument("--max-queue-size", type=int, default=config.server_max_queue_size)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Batches answered concurrently; defaults to 1 for local and 4 for openai")
+    args = parser.parse_args()
+
+    load_dotenv()
+    chat = build_chat(args.chat)
+    # Warm up the embedding model and the index before accepting connections
+    chat.retriever.retrieve("warm up")
+
+    async def run():
+        batcher = MicroBatcher(batch_answerer(chat), args.max_batch_size, args.batch_window_ms / 1000,
+                               args.max_queue_size, args.workers or (1 if args.chat == "local" else 4))
+        await QueryServer(batcher).serve(args.host, args.port)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        logger.info("Server stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import importlib.util
+import sys
+from types import ModuleType
+
+
+class _MissingModule(ModuleType):
+    """
+    Stands in for a package that is not installed. Attribute access raises the ModuleNotFoundError
+    the import would have raised, so only code that actually uses the package fails.
+    """
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            # Introspection such as inspect probes dunders and expects AttributeError
+            raise AttributeError(attr)
+        raise ModuleNotFoundError(f"No module named '{self.__name__}'", name=self.__name__)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Returns the module ``name`` without executing it; the actual import runs on first attribute access.
+    Keeps heavy dependencies off the import path of code that never uses them. A package that is not
+    installed fails on first attribute access too, with the usual ModuleNotFoundError.
+
+    Only top-level packages are deferred entirely: finding a submodule imports its parent package.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        # Not registered in sys.modules, so a package installed later is still imported normally
+        return _MissingModule(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
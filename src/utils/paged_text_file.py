@@ -0,0 +1,80 @@
+import mmap
+import os
+from typing import List, Optional
+
+import numpy as np
+
+
+def line_offsets(file_path, block_size: int = 1 << 24) -> np.ndarray:
+    """
+    Byte offsets of the line starts of a file, followed by the file size, so line ``i`` spans
+    ``offsets[i]:offsets[i + 1]``. The file is scanned in blocks of ``block_size`` bytes.
+    """
+    starts = [np.zeros(1, dtype='int64')]
+    position = 0
+    with open(file_path, 'rb') as file:
+        while block := file.read(block_size):
+            starts.append(np.flatnonzero(np.frombuffer(block, dtype='uint8') == ord('\n')) + position + 1)
+            position += len(block)
+    offsets = np.concatenate(starts)
+    if offsets[-1] != position:
+        # Last line without a trailing newline
+        offsets = np.append(offsets, position)
+    return offsets
+
+
+class PagedTextFile:
+    """
+    Memory-mapped text file read by line ranges. With the line offsets from line_offsets any range
+    is a single slice of the mapping, so pages of huge files are read without loading the file.
+    """
+
+    def __init__(self, file_path, offsets: Optional[np.ndarray] = None):
+        self.file_path = file_path
+        self.offsets = line_offsets(file_path) if offsets is None else offsets
+        with open(file_path, 'rb') as file:
+            # mmap refuses empty files
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size \
+                else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def lines(self, start: int, stop: int) -> str:
+        start, stop = max(0, start), min(stop, len(self))
+        if start >= stop:
+            return ""
+        data = self._data[int(self.offsets[start]):int(self.offsets[stop])]
+        return data.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def line_of(self, byte_offset: int) -> int:
+        return int(np.searchsorted(self.offsets, byte_offset, side='right')) - 1
+
+    def search(self, term: str, start_line: int = 0, limit: int = 100) -> List[int]:
+        """
+        Numbers of the lines containing ``term`` (case-sensitive), from ``start_line`` on and at most ``limit``.
+        """
+        needle = term.encode('utf-8')
+        matches = []
+        if not needle or start_line >= len(self):
+            return matches
+        position = int(self.offsets[max(0, start_line)])
+        while len(matches) < limit:
+            found = self._data.find(needle, position)
+            if found < 0:
+                break
+            line = self.line_of(found)
+            matches.append(line)
+            # One hit per line is enough, continue on the next one
+            position = int(self.offsets[line + 1])
+        return matches
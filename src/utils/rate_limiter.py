@@ -0,0 +1,25 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class AsyncRateLimiter:
+    """
+    Spaces out acquisitions so that at most ``requests_per_minute`` start per minute, and lets
+    callers push everyone back after the server answered with a rate-limit error.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next_slot = 0.0
+
+    async def acquire(self) -> None:
+        # Reserving a slot never awaits, so no lock is needed within one event loop
+        now = time.monotonic()
+        wait = self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, seconds: float) -> None:
+        self._next_slot = max(self._next_slot, time.monotonic() + seconds)
@@ -1,92 +1,273 @@
-import networkx as nx
-import matplotlib.pyplot as plt
+import functools
+import hashlib
+import heapq
+import json
+import os
+import weakref
+from collections import OrderedDict
+
 from loguru import logger
 
+from utils.lazy_import import lazy_import
+from utils.paged_text_file import PagedTextFile, line_offsets
+
+# Visualisation and RDF libraries are only imported when an RDF function is first used
+nx = lazy_import("networkx")
+rdflib = lazy_import("rdflib")
+st = lazy_import("streamlit")
+
 
-def rdf_to_graph_visualization(graph):
+class GraphCache:
     """
-    Takes RDF graph as input and outputs a visually enhanced graph representation.
+    Values derived from rdflib graphs by ``build``, one per graph object. Keyed by ``id(graph)``
+    rather than the graph itself, since rdflib graphs compare equal when their identifiers do;
+    entries are dropped when their graph is garbage collected.
 
-    :param graph: RDF graph parsed with rdflib
+    A cache hit only compares the number of triples, so lookups stay O(1) on large graphs. Adding or
+    removing triples is noticed; a change that keeps the size (replacing triples) is not, and
+    callers doing that run invalidate_graph afterwards.
     """
-    # Create a directed graph
+
+    def __init__(self, build):
+        self.build = build
+        self._entries = {}
+
+    def get(self, graph):
+        key = id(graph)
+        size = len(graph)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == size:
+            return entry[1]
+        if entry is None:
+            weakref.finalize(graph, self._entries.pop, key, None)
+        value = self.build(graph)
+        self._entries[key] = (size, value)
+        return value
+
+    def invalidate(self, graph):
+        entry = self._entries.get(id(graph))
+        if entry is not None:
+            # Keeps the key, so the finalizer registered for it stays the only one
+            self._entries[id(graph)] = (None, None)
+
+
+# Nodes drawn by default; the rest of a larger graph is sampled away by degree
+VISUALIZATION_MAX_NODES = 200
+# Above this many nodes the force-directed layout is replaced by the much cheaper spectral layout. Kept
+# below VISUALIZATION_MAX_NODES so that a sampled large graph is laid out spectrally by default.
+SPRING_LAYOUT_MAX_NODES = 100
+# Labels become unreadable clutter on larger drawings
+LABELS_MAX_NODES = 100
+EDGE_LABELS_MAX_EDGES = 100
+LAYOUT_CACHE_SIZE = 16
+
+_layout_cache = OrderedDict()
+
+
+def _build_networkx_graph(graph):
     nx_graph = nx.DiGraph()
+    nx_graph.add_edges_from((subj, obj, {"label": pred}) for subj, pred, obj in graph)
+    return nx_graph
 
-    # Add triples (subject, predicate, object) to the networkx graph
-    for subj, pred, obj in graph:
-        nx_graph.add_edge(subj, obj, label=pred)
 
-    # Draw the graph with custom positioning and color
-    pos = nx.spring_layout(
-        nx_graph, seed=42)  # Force-directed layout for better visualization
+_networkx_graphs = GraphCache(_build_networkx_graph)
+
+
+def rdf_networkx_graph(graph):
+    """
+    Directed networkx graph of the triples, edges labelled with their predicate. Cached like
+    ontology_index: while the graph lives and until its size changes or invalidate_graph is run.
+    """
+    return _networkx_graphs.get(graph)
+
+
+def sample_graph(nx_graph, focus=None, hops=1, max_nodes=None):
+    """
+    Restricts the graph to the ``hops``-neighbourhood of ``focus`` (ignoring edge direction), then to
+    its ``max_nodes`` nodes of highest degree. The focus node is always kept.
+    """
+    if focus is not None:
+        if focus not in nx_graph:
+            focus = rdflib.URIRef(focus)
+        if focus not in nx_graph:
+            raise ValueError(f"{focus} is not a node of the graph")
+        nx_graph = nx.ego_graph(nx_graph, focus, radius=hops, undirected=True)
+    if max_nodes is not None and nx_graph.number_of_nodes() > max_nodes:
+        nodes = heapq.nlargest(max_nodes, nx_graph.nodes, key=nx_graph.degree)
+        if focus is not None and focus not in nodes:
+            nodes[-1] = focus
+        nx_graph = nx_graph.subgraph(nodes)
+    return nx_graph
+
+
+def graph_layout(nx_graph):
+    """
+    Node positions, spring layout for small graphs and spectral layout for large ones. Positions are
+    cached by a hash of the node and edge set, so Streamlit reruns of the same view reuse them.
+    """
+    digest = hashlib.sha1()
+    for node in sorted(map(str, nx_graph.nodes)):
+        digest.update(node.encode('utf-8') + b"\0")
+    for u, v in sorted((str(u), str(v)) for u, v in nx_graph.edges):
+        digest.update(f"{u}\0{v}\n".encode('utf-8'))
+    key = digest.hexdigest()
+    if key in _layout_cache:
+        _layout_cache.move_to_end(key)
+        return _layout_cache[key]
+
+    if nx_graph.number_of_nodes() <= SPRING_LAYOUT_MAX_NODES:
+        pos = nx.spring_layout(nx_graph, seed=42)  # Force-directed layout for better visualization
+    else:
+        pos = nx.spectral_layout(nx_graph)
+    _layout_cache[key] = pos
+    if len(_layout_cache) > LAYOUT_CACHE_SIZE:
+        _layout_cache.popitem(last=False)
+    return pos
+
+
+def _short_label(term):
+    return str(term).rstrip('/#').rsplit('/', 1)[-1].rsplit('#', 1)[-1]
+
+
+def rdf_to_graph_visualization(graph, focus=None, hops=1, max_nodes=VISUALIZATION_MAX_NODES):
+    """
+    Takes RDF graph as input and outputs a visually enhanced graph representation.
+
+    :param graph: RDF graph parsed with rdflib
+    :param focus: optional node to centre on; only its ``hops``-neighbourhood is drawn
+    :param max_nodes: at most this many nodes are drawn, those of highest degree; None draws all
+    """
+    import matplotlib.pyplot as plt
+
+    full_graph = rdf_networkx_graph(graph)
+    nx_graph = sample_graph(full_graph, focus, hops, max_nodes)
+    num_nodes, num_edges = nx_graph.number_of_nodes(), nx_graph.number_of_edges()
+    pos = graph_layout(nx_graph)
     plt.figure(figsize=(12, 12))
 
-    # Define custom node and edge properties
+    # Define custom node and edge properties, shrinking nodes as the graph grows
     node_color = 'skyblue'
-    edge_color = 'gray'
     node_shape = 'o'  # Circular nodes
-    node_size = 4000
-    font_size = 12
+    node_size = 4000 if num_nodes <= 20 else max(20, 80000 // num_nodes)
+    font_size = 12 if num_nodes <= 20 else 8
     font_weight = 'bold'
 
-    # Draw nodes with color and shape
-    nx.draw(nx_graph, pos, with_labels=True, node_size=node_size,
-            node_color=node_color, font_size=font_size, font_weight=font_weight,
-            arrows=True, edge_color=edge_color, node_shape=node_shape)
-
-    # Customize edge labels (predicates) with specific font size and color
-    edge_labels = {(u, v): d['label'].split('/')[-1] for u, v, d in
-                   nx_graph.edges(data=True)}
-    nx.draw_networkx_edge_labels(nx_graph, pos, edge_labels=edge_labels,
-                                 font_color='darkgreen', font_size=10)
-
-    # Highlight edges with a different color and style for clarity
-    nx.draw_networkx_edges(nx_graph, pos, edge_color='orange', arrowstyle='->',
-                           arrowsize=15, width=2)
+    nx.draw_networkx_nodes(nx_graph, pos, node_size=node_size, node_color=node_color, node_shape=node_shape)
+    # All edges in one pass; arrows are individual patches, so large graphs get plain line segments
+    if num_edges <= EDGE_LABELS_MAX_EDGES:
+        nx.draw_networkx_edges(nx_graph, pos, edge_color='orange', arrows=True, arrowstyle='->',
+                               arrowsize=15, width=2, node_size=node_size)
+    else:
+        nx.draw_networkx_edges(nx_graph, pos, edge_color='orange', arrows=False, width=0.5)
+    if num_nodes <= LABELS_MAX_NODES:
+        nx.draw_networkx_labels(nx_graph, pos, labels={node: _short_label(node) for node in nx_graph.nodes},
+                                font_size=font_size, font_weight=font_weight)
+    if num_edges <= EDGE_LABELS_MAX_EDGES:
+        # Customize edge labels (predicates) with specific font size and color
+        edge_labels = {(u, v): _short_label(d['label']) for u, v, d in nx_graph.edges(data=True)}
+        nx.draw_networkx_edge_labels(nx_graph, pos, edge_labels=edge_labels,
+                                     font_color='darkgreen', font_size=10)
 
     # Set title and formatting for the plot
-    plt.title('Enhanced RDF Graph Representation', fontsize=16,
-              fontweight='bold')
+    title = 'Enhanced RDF Graph Representation'
+    if num_nodes < full_graph.number_of_nodes():
+        title += f' ({num_nodes} of {full_graph.number_of_nodes()} nodes)'
+    plt.title(title, fontsize=16, fontweight='bold')
+    plt.axis('off')
 
     # Streamlit integration: display the plot in Streamlit
     st.pyplot(plt)
+    plt.close()
+
+
+def rdf_adjacency(graph):
+    """
+    Index of the graph built in one pass: subject -> list of (predicate, object) in triple order.
+    """
+    adjacency = {}
+    for subj, pred, obj in graph:
+        adjacency.setdefault(subj, []).append((pred, obj))
+    return adjacency
 
 
-def rdf_to_json_hierarchy(graph, subject, visited=None):
+def rdf_to_json_hierarchy(graph, subject, visited=None, adjacency=None):
+    """
+    Nested JSON for ``subject``: URI objects are expanded in place, nodes already expanded within
+    this tree become ``{"ref": uri}``. Walks the tree with an explicit stack, so deep chains do not
+    hit the recursion limit.
+
+    :param adjacency: index from rdf_adjacency; built from ``graph`` when not given
+    """
+    if adjacency is None:
+        adjacency = rdf_adjacency(graph)
     if visited is None:
         visited = set()
 
     # Avoid circular references
     if subject in visited:
         return {"ref": str(subject)}
-
     visited.add(subject)
 
-    subject_data = {"subject": str(subject), "properties": {}}
+    root = {"subject": str(subject), "properties": {}}
+    stack = [(root, iter(adjacency.get(subject, ())))]
+    while stack:
+        subject_data, pairs = stack[-1]
+        for predicate, obj in pairs:
+            values = subject_data["properties"].setdefault(str(predicate), [])
+            # Check if the object is another node or a literal
+            if not isinstance(obj, rdflib.URIRef):
+                values.append(str(obj))
+            elif obj in visited:
+                values.append({"ref": str(obj)})
+            else:
+                visited.add(obj)
+                child = {"subject": str(obj), "properties": {}}
+                values.append(child)
+                # Continue with the child; the remaining pairs of this node resume once it is done
+                stack.append((child, iter(adjacency.get(obj, ()))))
+                break
+        else:
+            stack.pop()
+    return root
 
-    for predicate, obj in graph.predicate_objects(subject):
-        predicate_str = str(predicate)
 
-        # Check if the object is another node or a literal
-        if isinstance(obj, URIRef):
-            # Recursively fetch the object
-            subject_data["properties"].setdefault(predicate_str, []).append(
-                rdf_to_json_hierarchy(graph, obj, visited)
-            )
-        else:
-            subject_data["properties"].setdefault(predicate_str, []).append(
-                str(obj))
+def iter_rdf_json(graph, adjacency=None):
+    """
+    Yields one JSON entry per distinct subject, each converted exactly once. URI objects are given
+    as ``{"ref": uri}`` and resolve to the entry of that subject, so the output grows linearly with
+    the number of triples instead of repeating shared subtrees.
+    """
+    if adjacency is None:
+        adjacency = rdf_adjacency(graph)
+    for subject, pairs in adjacency.items():
+        properties = {}
+        for predicate, obj in pairs:
+            properties.setdefault(str(predicate), []).append(
+                {"ref": str(obj)} if isinstance(obj, rdflib.URIRef) else str(obj))
+        yield {"subject": str(subject), "properties": properties}
 
-    return subject_data
 
+def convert_rdf_to_json(graph, output_path=None):
+    """
+    Converts the graph to a list with one entry per distinct subject, see iter_rdf_json.
+
+    :param output_path: if given, the JSON array is streamed to this file entry by entry instead of
+        being built in memory, and the number of entries written is returned
+    """
+    if output_path is None:
+        return list(iter_rdf_json(graph))
 
-# Load the RDF file into an rdflib graph
-def convert_rdf_to_json(graph):
-    json_data = []
-    for subject in graph.subjects():
-        json_data.append(rdf_to_json_hierarchy(graph, subject))
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as file:
+        file.write("[")
+        for entry in iter_rdf_json(graph):
+            file.write(",\n" if count else "\n")
+            file.write(json.dumps(entry))
+            count += 1
+        file.write("\n]\n")
+    logger.info(f"Wrote {count} RDF subjects as JSON to {output_path}")
+    return count
 
-    return json_data
 
 def graph_summary(graph):
     """
@@ -108,10 +289,81 @@ def graph_summary(graph):
     }
 
 
-import streamlit as st
-from rdflib import Graph, URIRef, RDF, RDFS, OWL
-import os
-import json
+class OntologyIndex:
+    """
+    Type sets and subclass/subproperty adjacency of a graph, collected in one pass over its triples.
+    Class hierarchies built from it are kept per omitted prefix.
+    """
+
+    def __init__(self, graph):
+        self.types = {}  # rdf:type -> set of subjects
+        self.superclasses = {}
+        self.subclasses = {}
+        self.superproperties = {}
+        for subj, pred, obj in graph:
+            if pred == rdflib.RDF.type:
+                self.types.setdefault(obj, set()).add(subj)
+            elif pred == rdflib.RDFS.subClassOf:
+                self.superclasses.setdefault(subj, []).append(obj)
+                self.subclasses.setdefault(obj, []).append(subj)
+            elif pred == rdflib.RDFS.subPropertyOf:
+                self.superproperties.setdefault(subj, []).append(obj)
+        self.hierarchies = {}
+
+    def of_type(self, rdf_type):
+        return self.types.get(rdf_type, set())
+
+    def subclass_tree(self, parent_class):
+        """
+        Nested dict of all subclasses of ``parent_class``, built iteratively. A subclass that is
+        already on the path from the root (a subClassOf cycle) is left out instead of recursing forever.
+        """
+        tree = {}
+        path = {parent_class}
+        stack = [(parent_class, tree, iter(self.subclasses.get(parent_class, ())))]
+        while stack:
+            node, subtree, children = stack[-1]
+            for child in children:
+                if child in path:
+                    continue
+                subtree[child] = {}
+                path.add(child)
+                stack.append((child, subtree[child], iter(self.subclasses.get(child, ()))))
+                break
+            else:
+                stack.pop()
+                path.discard(node)
+        return tree
+
+    def class_hierarchy(self, omit=None):
+        """
+        Subclass trees of all top-level classes (those without a superclass), keyed by ``omit(class)``.
+        """
+        hierarchy = {}
+        for owl_class in self.of_type(rdflib.OWL.Class):
+            if owl_class not in self.superclasses:
+                hierarchy[omit(owl_class) if omit else owl_class] = self.subclass_tree(owl_class)
+        return hierarchy
+
+
+_ontology_indexes = GraphCache(OntologyIndex)
+
+
+def ontology_index(graph):
+    """
+    OntologyIndex of ``graph``, cached while the graph lives and rebuilt when its size changes or
+    invalidate_graph is run.
+    """
+    return _ontology_indexes.get(graph)
+
+
+def invalidate_graph(graph):
+    """
+    Drops the cached networkx graph and ontology index of ``graph``; needed after replacing triples
+    without changing their number.
+    """
+    _networkx_graphs.invalidate(graph)
+    _ontology_indexes.invalidate(graph)
 
 
 def create_ontology_summary_dict(ontology_graph, prefix_to_omit=None):
@@ -120,22 +372,23 @@ def create_ontology_summary_dict(ontology_graph, prefix_to_omit=None):
         if prefix_to_omit is None:
             return str(uri)
         return str(uri).lstrip(prefix_to_omit)
+    index = ontology_index(ontology_graph)
     # Extract ontology details
-    ontology = set(ontology_graph.subjects(RDF.type, OWL.Ontology))
+    ontology = index.of_type(rdflib.OWL.Ontology)
     # Extract classes
-    classes = set(ontology_graph.subjects(RDF.type, OWL.Class))
+    classes = index.of_type(rdflib.OWL.Class)
     # Extract object properties
-    object_properties = set(ontology_graph.subjects(RDF.type, OWL.ObjectProperty))
+    object_properties = index.of_type(rdflib.OWL.ObjectProperty)
     # Extract data properties and their hierarchy
-    data_properties = set(ontology_graph.subjects(RDF.type, OWL.DatatypeProperty))
+    data_properties = index.of_type(rdflib.OWL.DatatypeProperty)
     data_property_hierarchy = {}
     for dp in data_properties:
-        sub_properties = list(ontology_graph.objects(dp, RDFS.subPropertyOf))
+        sub_properties = index.superproperties.get(dp)
         data_property_hierarchy[remove_prefix(dp)] = [
             remove_prefix(sub) for sub in sub_properties
         ] if sub_properties else None
     # Extract annotation properties
-    annotation_properties = set(ontology_graph.subjects(RDF.type, OWL.AnnotationProperty))
+    annotation_properties = index.of_type(rdflib.OWL.AnnotationProperty)
     # Summary of the RDF content
     ontology_summary = {
         "Ontology": [remove_prefix(onto) for onto in ontology],
@@ -192,47 +445,72 @@ def display_ontology_summary(ontology_summary):
 
 def get_subclasses(graph, parent_class):
     """
-    Recursive function to get all subclasses of a given parent class.
+    Get all subclasses of a given parent class as a nested dict.
     """
-    subclasses = {}
-
-    # Find all subclasses of the parent_class
-    for subclass in graph.subjects(RDFS.subClassOf, parent_class):
-        # Recurse to find subclasses of this subclass
-        subclasses[subclass] = get_subclasses(graph, subclass)
-
-    return subclasses
+    return ontology_index(graph).subclass_tree(parent_class)
 
 
 def display_class_hierarchy(graph, omit_prefix=None):
     """
     Build a class hierarchy from the RDF graph as a JSON-like dictionary.
     """
-    # Start by finding all top-level classes (which have no superclass)
-    hierarchy = {}
-
-    def omit(iri):
-        if omit_prefix:
-            return iri.lstrip(omit_prefix)
-        else:
-            return iri
-    for owl_class in graph.subjects(RDF.type, OWL.Class):
-        # Check if this class has no superclass (i.e., top-level)
-        if not list(graph.objects(owl_class, RDFS.subClassOf)):
-            hierarchy[omit(owl_class)] = get_subclasses(graph, owl_class)
+    index = ontology_index(graph)
+    hierarchy = index.hierarchies.get(omit_prefix)
+    if hierarchy is None:
+        def omit(iri):
+            if omit_prefix:
+                return iri.lstrip(omit_prefix)
+            else:
+                return iri
+        # Top-level classes are those without a superclass
+        hierarchy = index.hierarchies[omit_prefix] = index.class_hierarchy(omit)
     st.json(hierarchy, expanded=False)
 
 
-@st.cache_data
 def read_raw_file(file_path):
     with open(file_path, 'r') as file:
         logger.info(f"Reading raw RDF content from {file_path}")
         return file.read()
 
 
-def display_raw_rdf(rdf_path):
+def raw_file_line_offsets(file_path):
+    """
+    Line offset index of the file, cached by Streamlit across reruns. Only the offsets are cached,
+    never the content; the size and modification time are part of the key, so edits invalidate it.
+    """
+    stat = os.stat(file_path)
+    return _cached_line_offsets()(str(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_line_offsets():
+    # st.cache_data is applied on first use, since decorating at import time would import streamlit
+    @st.cache_data
+    def read_line_offsets(file_path, size, mtime_ns):
+        logger.info(f"Indexing lines of raw RDF file {file_path} ({size} bytes)")
+        return line_offsets(file_path)
+    return read_line_offsets
+
+
+def display_raw_rdf(rdf_path, page_size=200, max_matches=100):
     """
-    Display the raw RDF content from a file
-     when the `Show raw RDF` button is clicked.
+    Display the raw RDF content from a file page by page, with a search box jumping to matching lines.
+    Pages are read from a memory-mapped file, so the file is never loaded as a whole.
     """
-    st.code(read_raw_file(rdf_path), language="xml")
+    with PagedTextFile(rdf_path, raw_file_line_offsets(rdf_path)) as raw_file:
+        num_pages = max(1, -(-len(raw_file) // page_size))
+        term = st.text_input("Search", key=f"raw_rdf_search_{rdf_path}")
+        first_line = 0
+        if term:
+            matches = raw_file.search(term, limit=max_matches)
+            if matches:
+                st.caption(f"Lines with matches: {', '.join(str(line + 1) for line in matches)}"
+                           + (" ..." if len(matches) == max_matches else ""))
+                first_line = matches[0]
+            else:
+                st.caption("No matches.")
+        page = st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages,
+                               value=first_line // page_size + 1, key=f"raw_rdf_page_{rdf_path}_{term}")
+        start = (page - 1) * page_size
+        st.caption(f"Lines {start + 1}-{min(start + page_size, len(raw_file))} of {len(raw_file)}")
+        st.code(raw_file.lines(start, start + page_size), language="xml")
@@ -1,8 +1,12 @@
+import asyncio
 import functools
 import time
+from typing import Awaitable, Callable, Optional
 
 from loguru import logger
 
+from utils.rate_limiter import AsyncRateLimiter
+
 
 def retry_on_exception(retries=3, delay=1):
     def decorator_retry(func):
@@ -20,3 +24,41 @@ def retry_on_exception(retries=3, delay=1):
             return None
         return wrapper
     return decorator_retry
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    # Covers openai.RateLimitError and other HTTP clients that expose the status code
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def async_retry_on_rate_limit(call: Callable[[], Awaitable], retries: int = 5, base_delay: float = 1.0,
+                                    max_delay: float = 60.0, limiter: Optional[AsyncRateLimiter] = None):
+    """
+    Awaits ``call()`` and retries it with exponential backoff, or the server's Retry-After, when it
+    fails with a rate-limit error. The optional limiter is penalized so that other requests back off too.
+    """
+    attempt = 0
+    while True:
+        if limiter:
+            await limiter.acquire()
+        try:
+            return await call()
+        except Exception as e:
+            attempt += 1
+            if not is_rate_limit_error(e) or attempt > retries:
+                raise
+            delay = retry_after_seconds(e) or min(max_delay, base_delay * 2 ** (attempt - 1))
+            logger.warning(f"Rate limited (attempt {attempt}/{retries}), retrying in {delay:.1f} seconds")
+            if limiter:
+                limiter.penalize(delay)
+            else:
+                await asyncio.sleep(delay)
@@ -0,0 +1,275 @@
+import bisect
+import functools
+import inspect
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from config import ConfigManager
+from utils.singleton_meta import SingletonMeta
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000)
+
+
+class Histogram:
+    """
+    Bucketed distribution: ``counts[i]`` holds the observations in ``(buckets[i - 1], buckets[i]]``,
+    the last slot those above the largest bucket. Prometheus export makes the counts cumulative.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-quantile, the usual bucketed estimate
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def as_dict(self) -> dict:
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "count": self.count, "sum": self.sum,
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class Sink:
+    """
+    Receives finished spans as they happen and metric snapshots on Tracer.export.
+    """
+
+    def on_span(self, name: str, seconds: float, attributes: dict) -> None:
+        pass
+
+    def export(self, snapshot: dict) -> None:
+        pass
+
+
+class LogSink(Sink):
+
+    def __init__(self, level: str = "DEBUG"):
+        self.level = level
+
+    def on_span(self, name: str, seconds: float, attributes: dict) -> None:
+        logger.log(self.level, f"{name} took {seconds * 1000:.2f} ms {attributes or ''}")
+
+    def export(self, snapshot: dict) -> None:
+        for name, histogram in snapshot["histograms"].items():
+            logger.log(self.level, f"{name}: count={histogram['count']} sum={histogram['sum']:.4f} "
+                                   f"p50<={histogram['p50']} p99<={histogram['p99']}")
+        for name, value in snapshot["counters"].items():
+            logger.log(self.level, f"{name}: {value}")
+
+
+class JsonFileSink(Sink):
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def export(self, snapshot: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(json.dumps(snapshot, indent=2), encoding='utf-8')
+
+
+class PrometheusSink(Sink):
+    """
+    Writes the Prometheus text exposition format, e.g. for the node exporter's textfile collector.
+    """
+
+    def __init__(self, path: Path, prefix: str = "rag_"):
+        self.path = path
+        self.prefix = prefix
+
+    def export(self, snapshot: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(prometheus_text(snapshot, self.prefix), encoding='utf-8')
+        # The collector may read at any time, so the file is replaced atomically
+        tmp_path.replace(self.path)
+
+
+def prometheus_text(snapshot: dict, prefix: str = "rag_") -> str:
+    lines = []
+    for name, value in sorted(snapshot["counters"].items()):
+        metric = _metric_name(prefix + name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, histogram in sorted(snapshot["histograms"].items()):
+        metric = _metric_name(prefix + name)
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(histogram["buckets"] + ["+Inf"], histogram["counts"]):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"{metric}_sum {histogram['sum']}", f"{metric}_count {histogram['count']}"]
+    return "\n".join(lines) + "\n"
+
+
+def _metric_name(name: str) -> str:
+    return "".join(char if char.isalnum() or char == "_" else "_" for char in name)
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "attributes", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.tracer._finish_span(self.name, time.perf_counter() - self.start, self.attributes)
+        return False
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key: str, value) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer(metaclass=SingletonMeta):
+    """
+    Process-wide spans, counters and histograms. Every span records its duration in the
+    ``<name>.seconds`` histogram and is passed to the sinks; export sends a snapshot of all
+    metrics to the sinks. While disabled every call returns after checking the flag.
+
+    Tracing follows ``ConfigManager().tracing_enabled``, read on every check so that configure()
+    takes effect at any time; enable() and disable() override the config.
+    """
+
+    def __init__(self):
+        self._config = ConfigManager()
+        self._enabled: Optional[bool] = None
+        self.sinks: List[Sink] = []
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled if self._enabled is not None else self._config.tracing_enabled
+
+    def enable(self, *sinks: Sink) -> "Tracer":
+        self.sinks.extend(sinks)
+        self._enabled = True
+        return self
+
+    def disable(self) -> None:
+        self._enabled = False
+
+    def span(self, name: str, **attributes):
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, attributes)
+
+    def count(self, name: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = SIZE_BUCKETS) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def _finish_span(self, name: str, seconds: float, attributes: dict) -> None:
+        self.observe(f"{name}.seconds", seconds, LATENCY_BUCKETS)
+        for sink in self.sinks:
+            try:
+                sink.on_span(name, seconds, attributes)
+            except Exception as e:
+                logger.warning(f"Tracing sink {type(sink).__name__} failed: {e}")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"timestamp": time.time(), "counters": dict(self._counters),
+                    "histograms": {name: histogram.as_dict() for name, histogram in self._histograms.items()}}
+
+    def export(self) -> dict:
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            try:
+                sink.export(snapshot)
+            except Exception as e:
+                logger.warning(f"Tracing sink {type(sink).__name__} failed: {e}")
+        return snapshot
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def traced(name: str):
+    """
+    Decorator running every call of the function (sync, async or generator) in a span called
+    ``name``. The span of a generator lasts until it is exhausted or closed.
+    """
+    def decorator(func):
+        tracer = Tracer()
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return (yield from func(*args, **kwargs))
+                with _Span(tracer, name, {}):
+                    return (yield from func(*args, **kwargs))
+            return generator_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with _Span(tracer, name, {}):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with _Span(tracer, name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+
+# Modules import each other relative to src, as when running from that directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from benchmarks.pipeline_benchmark import FAKE_ENCODER, HashingEncoder  # noqa: E402
+from retrievers.faiss_retriever import register_embedding_model  # noqa: E402
+
+
+@pytest.fixture
+def encoder_name() -> str:
+    # Deterministic offline stand-in for the sentence-transformers model
+    register_embedding_model(FAKE_ENCODER, HashingEncoder(dimension=64))
+    return FAKE_ENCODER
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    pymupdf = pytest.importorskip("pymupdf")
+
+    def make(pages: List[str], name: str = "doc.pdf") -> Path:
+        path = tmp_path / name
+        document = pymupdf.open()
+        for text in pages:
+            page = document.new_page()
+            for line_num, line in enumerate(text.splitlines()):
+                page.insert_text((36, 36 + 11 * line_num), line, fontsize=8)
+        document.save(str(path))
+        document.close()
+        return path
+    return make
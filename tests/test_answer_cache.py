@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from chat import answer_cache
+from chat.answer_cache import SemanticAnswerCache
+
+
+def _vector(*values: float) -> np.ndarray:
+    return np.array(values, dtype='float32')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_similar_query_of_the_same_document_hits():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.put("doc", "what is the dividend?", _vector(1, 0, 0), "1.20 EUR")
+    # Cosine similarity, so the scale of the embedding does not matter
+    assert cache.get("doc", _vector(3, 0.3, 0)) == "1.20 EUR"
+    assert cache.get("doc", _vector(1, 1, 0)) is None
+    assert cache.get("other", _vector(1, 0, 0)) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_get_many_answers_each_query():
+    cache = SemanticAnswerCache(similarity_threshold=0.9)
+    cache.put_many("doc", ["a", "b"], np.stack([_vector(1, 0), _vector(0, 1)]), ["A", "B"])
+    assert cache.get_many("doc", np.stack([_vector(0, 1), _vector(1, 1), _vector(1, 0)])) == ["B", None, "A"]
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    cache.put("doc", "q", _vector(1, 0), "old")
+    clock[0] += 59
+    assert cache.get("doc", _vector(1, 0)) == "old"
+    clock[0] += 2
+    assert cache.get("doc", _vector(1, 0)) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.put("doc", "a", _vector(1, 0, 0), "A")
+    cache.put("doc", "b", _vector(0, 1, 0), "B")
+    assert cache.get("doc", _vector(1, 0, 0)) == "A"
+    cache.put("doc", "c", _vector(0, 0, 1), "C")
+    assert cache.get("doc", _vector(0, 1, 0)) is None
+    assert cache.get("doc", _vector(1, 0, 0)) == "A"
+    assert cache.get("doc", _vector(0, 0, 1)) == "C"
+
+
+def test_entries_are_replayed_from_the_file(tmp_path, clock):
+    path = tmp_path / "answers.jsonl"
+    cache = SemanticAnswerCache(max_entries=2, ttl_seconds=60, path=path)
+    for i in range(6):
+        cache.put("doc", str(i), np.eye(6, dtype='float32')[i], str(i))
+    # Compacted once the file holds more than twice the cache size
+    assert len(path.read_text(encoding='utf-8').splitlines()) <= 4
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write("not json\n")
+
+    reloaded = SemanticAnswerCache(max_entries=2, ttl_seconds=60, path=path)
+    assert [reloaded.get("doc", np.eye(6, dtype='float32')[i]) for i in range(6)] == [None] * 4 + ["4", "5"]
+    clock[0] += 61
+    assert len(SemanticAnswerCache(ttl_seconds=60, path=path)) == 0
@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+import pytest
+
+from retrievers.bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    "Revenue grew in Europe and Asia.",
+    "The board proposed a dividend. The dividend is paid in cash.",
+    "",
+    "Operating margin in Europe improved.",
+]
+
+
+def test_tokenize_keeps_figures_together():
+    assert tokenize("Revenue of 6,979,736 EUR, up 12.5% (BRK.B)") == ["revenue", "of", "6,979,736", "eur", "up",
+                                                                        "12.5", "brk.b"]
+
+
+def test_scores_match_okapi_bm25():
+    index = BM25Index(CHUNKS, k1=1.5, b=0.75)
+    lengths = [len(tokenize(chunk)) for chunk in CHUNKS]
+    live = sum(length > 0 for length in lengths)
+    average = sum(lengths) / live
+
+    def expected(doc: int, term: str) -> float:
+        freq = tokenize(CHUNKS[doc]).count(term)
+        if not freq:
+            return 0.0
+        docs_with_term = sum(term in tokenize(chunk) for chunk in CHUNKS)
+        idf = math.log1p((live - docs_with_term + 0.5) / (docs_with_term + 0.5))
+        return idf * freq * 2.5 / (freq + 1.5 * (0.25 + 0.75 * lengths[doc] / average))
+
+    scores = index.scores("europe dividend unknown")
+    for doc in range(len(CHUNKS)):
+        assert scores[doc] == pytest.approx(expected(doc, "europe") + expected(doc, "dividend"), rel=1e-5)
+
+
+def test_search_ranks_and_pads():
+    scores, ids = BM25Index(CHUNKS).search(["dividend", "europe margin", "nothing matches"], top_k=3)
+    assert list(ids[0]) == [1, -1, -1]
+    assert list(ids[1]) == [3, 0, -1]
+    assert scores[1, 0] > scores[1, 1] > 0
+    assert list(ids[2]) == [-1, -1, -1]
+    # An empty chunk has no postings and never matches
+    assert 2 not in ids
+
+
+def test_reciprocal_rank_fusion():
+    dense = np.array([[0, 1, 2], [5, -1, -1]])
+    lexical = np.array([[1, 3, -1], [-1, -1, -1]])
+    scores, ids = reciprocal_rank_fusion([dense, lexical], top_k=3, k=60)
+    # 1 appears in both rankings; 3, second in one, beats 2, third in the other
+    assert list(ids[0]) == [1, 0, 3]
+    assert scores[0, 0] == pytest.approx(1 / 62 + 1 / 61)
+    assert scores[0, 1] == pytest.approx(1 / 61)
+    assert list(ids[1]) == [5, -1, -1]
+    assert list(scores[1, 1:]) == [0, 0]
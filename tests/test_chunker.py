@@ -0,0 +1,59 @@
+import pytest
+
+from benchmarks.pipeline_benchmark import HashingEncoder
+from retrievers.chunker import TokenChunker
+from retrievers.faiss_retriever import FaissRetriever
+
+PAGES = [
+    "Revenue grew 12.5% in Europe. Asia stayed flat, while America declined slightly.",
+    "",
+    "The board proposed a dividend of 1,200,000 EUR. Liquidity risks remain limited.",
+]
+
+
+@pytest.fixture
+def tokenizer():
+    return HashingEncoder().tokenizer
+
+
+@pytest.mark.parametrize("chunk_tokens, overlap_tokens", [(4, 0), (5, 2), (50, 10)])
+def test_chunks_carry_their_page_and_span(tokenizer, chunk_tokens, overlap_tokens):
+    chunked = TokenChunker(tokenizer, chunk_tokens, overlap_tokens).chunk_pages(PAGES)
+    assert len(chunked.texts) == len(chunked.pages) == len(chunked.starts) == len(chunked.ends)
+    for text, page, start, end in zip(chunked.texts, chunked.pages, chunked.starts, chunked.ends):
+        assert PAGES[page - 1][start:end] == text
+        assert len(tokenizer(text)["input_ids"]) <= chunk_tokens
+    # An empty page yields no chunks, every other page is covered from its first to its last token
+    assert set(chunked.pages) == {1, 3}
+    for page in (1, 3):
+        spans = [(start, end) for p, start, end in zip(chunked.pages, chunked.starts, chunked.ends) if p == page]
+        assert spans[0][0] == 0
+        assert spans[-1][1] == len(PAGES[page - 1])
+
+
+def test_windows_overlap_by_the_requested_tokens(tokenizer):
+    chunker = TokenChunker(tokenizer, 6, 2)
+    offsets = tokenizer(PAGES[0], return_offsets_mapping=True)["offset_mapping"]
+    _, starts, ends = chunker.chunk_page(PAGES[0])
+    assert starts == [offsets[i][0] for i in range(0, len(offsets) - 2, 4)]
+    assert ends[0] == offsets[5][1]
+
+
+def test_page_numbers_can_be_given(tokenizer):
+    chunked = TokenChunker(tokenizer, 100).chunk_pages([PAGES[2], PAGES[0]], [7, 3])
+    assert list(chunked.pages) == [7, 3]
+    assert chunked.texts == [PAGES[2], PAGES[0]]
+
+
+@pytest.mark.parametrize("chunk_tokens, overlap_tokens", [(0, 0), (4, 4), (4, -1)])
+def test_invalid_windows_are_rejected(tokenizer, chunk_tokens, overlap_tokens):
+    with pytest.raises(ValueError):
+        TokenChunker(tokenizer, chunk_tokens, overlap_tokens)
+
+
+def test_chunk_text_windows_words_by_default(tokenizer):
+    text = " ".join(f"w{i}" for i in range(7))
+    assert FaissRetriever.chunk_text(text, 3) == ["w0 w1 w2", "w3 w4 w5", "w6"]
+    assert FaissRetriever.chunk_text(text, 3, overlap=1) == ["w0 w1 w2", "w2 w3 w4", "w4 w5 w6"]
+    assert FaissRetriever.chunk_text(PAGES[0], 4, tokenizer)[0] == "Revenue grew 12."
+    assert FaissRetriever.chunk_text("") == []
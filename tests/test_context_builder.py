@@ -0,0 +1,70 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+from chat.context_builder import ContextBuilder
+
+
+class _Retriever:
+    # The part of FaissRetriever that ContextBuilder uses
+    def __init__(self, chunks: List[str], embeddings: np.ndarray):
+        self.chunks = chunks
+        self.embeddings = np.asarray(embeddings, dtype='float32')
+
+    def chunk_embeddings(self, ids: np.ndarray) -> np.ndarray:
+        return self.embeddings[ids]
+
+
+def count_words(texts: List[str]) -> List[int]:
+    return [len(text.split()) for text in texts]
+
+
+CHUNKS = [
+    "one two three four",
+    "one two three four",
+    "five six. seven eight. nine ten.",
+    "eleven twelve",
+]
+EMBEDDINGS = [[1, 0, 0], [1, 0.01, 0], [0, 1, 0], [0, 0, 1]]
+
+
+@pytest.fixture
+def builder():
+    # The separator counts as one token
+    return ContextBuilder(_Retriever(CHUNKS, EMBEDDINGS), count_words, token_budget=100, dedup_threshold=0.95,
+                          separator=" | ")
+
+
+def test_near_duplicates_are_dropped(builder):
+    context = builder.build(np.array([0, 1, 3, -1]))
+    assert context.chunk_ids == [0, 3]
+    assert context.text == "one two three four | eleven twelve"
+    assert context.duplicates_dropped == 1
+    assert context.tokens == 4 + 1 + 2
+    # Joining 0, 1 and 3 whole would have cost 4 + 4 + 2 plus two separators
+    assert context.tokens_saved == 12 - 7
+
+
+def test_last_chunk_is_cut_at_a_sentence_boundary(builder):
+    builder.token_budget = 9
+    context = builder.build(np.array([0, 2, 3]))
+    assert context.chunk_ids == [0, 2]
+    assert context.text == "one two three four | five six. seven eight."
+    assert context.tokens == 9
+    assert context.tokens <= builder.token_budget
+
+
+def test_chunk_without_a_fitting_sentence_is_left_out(builder):
+    builder.token_budget = 6
+    context = builder.build(np.array([0, 2]))
+    assert context.chunk_ids == [0]
+    assert context.tokens == 4
+
+
+@pytest.mark.parametrize("budget", [1, 5, 8, 12, 100])
+def test_contexts_stay_within_the_budget(builder, budget):
+    builder.token_budget = budget
+    for context in builder.build_many(np.array([[0, 2, 3, 1], [3, 2, 1, 0], [-1, -1, -1, -1]])):
+        assert context.tokens <= budget
+        assert context.tokens == count_words([context.text])[0]
@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip("faiss")
+
+from artifacts.pdf import Pdf  # noqa: E402
+from retrievers.corpus_retriever import CorpusRetriever  # noqa: E402
+from retrievers.faiss_retriever import FaissRetriever  # noqa: E402
+from retrievers.index_cache import IndexCache  # noqa: E402
+
+DOCUMENTS = {
+    "annual": ["revenue grew in europe and asia", "the board approved a dividend of two euros"],
+    "interim": ["revenue declined in america", "headcount stayed flat in the quarter"],
+    "risk": ["liquidity risk remains limited", "currency risk rose with the dollar"],
+    "esg": ["emissions fell by a tenth", "the board added two independent directors"],
+}
+QUERIES = ["revenue in europe", "board dividend", "risk of the dollar"]
+
+
+@pytest.fixture
+def corpus(tmp_path, make_pdf, encoder_name):
+    for doc_id, pages in DOCUMENTS.items():
+        make_pdf(pages, f"{doc_id}.pdf")
+    return CorpusRetriever(tmp_path, docs_per_shard=2, cache=IndexCache(tmp_path / "cache"), workers=2,
+                           embedding_model=encoder_name)
+
+
+def best_per_document(corpus, top_k, doc_ids):
+    # Every document searched on its own, then the best hits over all of them
+    hits = []
+    for doc_id in doc_ids:
+        retriever = FaissRetriever(Pdf(corpus.pdf_paths[doc_id]), **corpus.retriever_kwargs)
+        distances, ids = retriever.search_ids(retriever.encode(QUERIES), top_k)
+        for query_num in range(len(QUERIES)):
+            hits += [(query_num, float(distance), doc_id, int(chunk_id))
+                     for distance, chunk_id in zip(distances[query_num], ids[query_num]) if chunk_id >= 0]
+    best = [sorted(hit[1:] for hit in hits if hit[0] == query_num)[:top_k] for query_num in range(len(QUERIES))]
+    return [[(doc_id, chunk_id) for _, doc_id, chunk_id in query_hits] for query_hits in best]
+
+
+@pytest.mark.parametrize("top_k", [1, 3, 20])
+def test_merged_top_k_is_the_best_of_every_document(corpus, top_k):
+    results = corpus.retrieve_many(QUERIES, top_k)
+    assert [[(hit["doc_id"], hit["id"]) for hit in hits] for hits in results] == \
+        best_per_document(corpus, top_k, corpus.doc_ids)
+    for hits in results:
+        distances = [hit["distance"] for hit in hits]
+        assert distances == sorted(distances)
+        for hit in hits:
+            assert hit["text"] in DOCUMENTS[hit["doc_id"]][hit["page"] - 1]
+
+
+def test_doc_ids_filter_loads_only_the_needed_shards(corpus, monkeypatch):
+    loaded = []
+    load_shard = corpus.load_shard
+    monkeypatch.setattr(corpus, "load_shard", lambda shard_id: loaded.append(shard_id) or load_shard(shard_id))
+    assert corpus.shards == [["annual", "esg"], ["interim", "risk"]]
+
+    results = corpus.retrieve_many(QUERIES, 3, doc_ids=["risk"])
+    assert loaded == [1]
+    assert list(corpus._loaded) == [1]
+    assert {hit["doc_id"] for hits in results for hit in hits} == {"risk"}
+    assert [[(hit["doc_id"], hit["id"]) for hit in hits] for hits in results] == \
+        best_per_document(corpus, 3, ["risk"])
+
+    corpus.retrieve("revenue", 3, doc_ids=["annual", "esg"])
+    assert loaded == [1, 0]
+    with pytest.raises(ValueError):
+        corpus.retrieve("revenue", doc_ids=["missing"])
+
+
+def test_least_recently_used_shard_is_unloaded(corpus):
+    corpus.max_loaded_shards = 1
+    corpus.retrieve("revenue", doc_ids=["annual"])
+    corpus.retrieve("revenue", doc_ids=["risk"])
+    assert list(corpus._loaded) == [1]
@@ -0,0 +1,91 @@
+import faiss
+import numpy as np
+import pytest
+
+from artifacts.pdf import Pdf
+from retrievers.faiss_retriever import FaissRetriever
+from retrievers.index_cache import IndexCache
+
+
+@pytest.mark.parametrize("pages", [[""], ["revenue grew in europe and asia"]])
+def test_streaming_indexes_tiny_pdf(tmp_path, make_pdf, encoder_name, pages):
+    pdf_path = make_pdf(pages)
+    cache = IndexCache(tmp_path / "cache")
+    reference = Pdf(pdf_path)
+    reference.get_text()
+    # The pipeline of a one-page PDF often completes before start() returns
+    for _ in range(20):
+        cache.clear()
+        retriever = FaissRetriever(Pdf(pdf_path), encoder_name, cache=cache, streaming=True)
+        assert retriever.wait_until_indexed(10)
+        assert retriever.page_hashes == reference.page_hashes
+        assert cache.load(retriever._cache_key(IndexCache.file_hash(pdf_path))) is not None
+
+
+@pytest.mark.parametrize("storage", ["float16", "int8"])
+def test_mapped_storage_retrieves_like_memory(tmp_path, make_pdf, encoder_name, storage):
+    pdf_path = make_pdf(["revenue grew in europe and asia", "the board approved a dividend",
+                         "headcount stayed flat in the quarter"])
+    memory = FaissRetriever(Pdf(pdf_path), encoder_name)
+    mapped = FaissRetriever(Pdf(pdf_path), encoder_name, storage=storage, store_dir=tmp_path / "store")
+    reopened = FaissRetriever(Pdf(pdf_path), encoder_name, storage=storage, store_dir=tmp_path / "store")
+    for retriever in (mapped, reopened):
+        assert list(retriever.chunks) == list(memory.chunks)
+        assert retriever.retrieve("dividend", top_k=1) == memory.retrieve("dividend", top_k=1)
+
+
+PAGES = ["revenue grew in europe and asia", "the board approved a dividend", "headcount stayed flat in the quarter"]
+
+
+def _assert_dense(retriever: FaissRetriever, pdf: Pdf) -> None:
+    assert all(retriever.chunks)
+    assert retriever.index.ntotal == len(retriever.chunks)
+    assert sorted(faiss.vector_to_array(retriever.index.id_map)) == list(range(len(retriever.chunks)))
+    for chunk, page, start, end in zip(retriever.chunks, retriever.chunk_pages, retriever.chunk_starts,
+                                       retriever.chunk_ends):
+        assert pdf.pages[page - 1][start:end] == chunk
+
+
+@pytest.mark.parametrize("new_pages, expected", [
+    (PAGES[:1] + ["the board cut the dividend"] + PAGES[2:], (2, 1, 0, 0)),
+    (PAGES[:1] + PAGES[2:], (2, 0, 0, 1)),
+    (PAGES + ["operating margin improved"], (3, 0, 1, 0)),
+    (["operating margin improved"] + PAGES, (3, 0, 1, 0)),
+])
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "ivf_flat"])
+def test_reindex_reports_and_renumbers(tmp_path, make_pdf, encoder_name, new_pages, expected, index_type):
+    cache = IndexCache(tmp_path / "cache")
+    retriever = FaissRetriever(Pdf(make_pdf(PAGES, "old.pdf")), encoder_name, cache=cache, index_type=index_type)
+    new_pdf = Pdf(make_pdf(new_pages, "new.pdf"))
+    report = retriever.reindex(new_pdf)
+    assert (report.pages_reused, report.pages_changed, report.pages_added, report.pages_removed) == expected
+    _assert_dense(retriever, new_pdf)
+    fresh = FaissRetriever(Pdf(new_pdf.pdf_path), encoder_name)
+    assert sorted(retriever.chunks) == sorted(fresh.chunks)
+    for page in new_pages:
+        assert retriever.retrieve(page, top_k=1) == fresh.retrieve(page, top_k=1)
+
+    cached = FaissRetriever(Pdf(new_pdf.pdf_path), encoder_name, cache=cache, index_type=index_type)
+    assert list(cached.chunks) == list(retriever.chunks)
+    _assert_dense(cached, new_pdf)
+
+
+@pytest.mark.parametrize("index_type", ["ivf_flat", "ivf_pq"])
+def test_ivf_chunk_embeddings_are_read_back_without_encoding(tmp_path, make_pdf, encoder_name, index_type,
+                                                              monkeypatch):
+    cache = IndexCache(tmp_path / "cache")
+    pages = [" ".join(f"{word}{i}" for i in range(40)) for word in ("alpha", "beta", "gamma", "delta")]
+    retriever = FaissRetriever(Pdf(make_pdf(pages, "old.pdf")), encoder_name, chunk_tokens=8, chunk_overlap=0,
+                               cache=cache, index_type=index_type)
+    reindexed = FaissRetriever(Pdf(make_pdf(pages, "old.pdf")), encoder_name, chunk_tokens=8, chunk_overlap=0,
+                               cache=cache, index_type=index_type)
+    reindexed.reindex(Pdf(make_pdf(pages[1:] + ["epsilon zeta"], "new.pdf")))
+    for current in (retriever, reindexed):
+        ids = np.arange(len(current.chunks))
+        expected = current.encode(list(current.chunks))
+        monkeypatch.setattr(current, "encode", lambda *args, **kwargs: pytest.fail("chunks encoded again"))
+        embeddings = current.chunk_embeddings(ids)
+        assert embeddings.shape == expected.shape
+        if index_type == "ivf_flat":
+            # IVF-PQ decodes approximations only
+            assert np.allclose(embeddings, expected, atol=1e-5)
@@ -0,0 +1,93 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from retrievers.index_cache import IndexCache  # noqa: E402
+
+
+def _store(cache: IndexCache, key: str, vectors: int = 50) -> None:
+    index = faiss.IndexFlatL2(16)
+    index.add(np.random.default_rng(0).standard_normal((vectors, 16)).astype('float32'))
+    cache.store(key, index, [f"{key} {i}" for i in range(vectors)], {"source": key},
+                {"pages": np.ones(vectors, dtype='int32')})
+
+
+def _age(cache: IndexCache, key: str, seconds_ago: float) -> None:
+    meta_file = cache.cache_dir / key / IndexCache.META_FILE
+    timestamp = meta_file.stat().st_mtime - seconds_ago
+    os.utime(meta_file, (timestamp, timestamp))
+
+
+def test_round_trip(tmp_path):
+    cache = IndexCache(tmp_path)
+    _store(cache, "a")
+    entry = cache.load("a")
+    assert entry.index.ntotal == 50
+    assert entry.chunks[3] == "a 3"
+    assert entry.meta["source"] == "a"
+    assert list(entry.arrays["pages"]) == [1] * 50
+    assert cache.load("missing") is None
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    _store(IndexCache(tmp_path, max_bytes=1 << 30), "probe")
+    entry_size = IndexCache._entry_size(tmp_path / "probe")
+    cache = IndexCache(tmp_path, max_bytes=int(2.5 * entry_size))
+    cache.clear()
+    _store(cache, "a")
+    _store(cache, "b")
+    _age(cache, "a", 20)
+    _age(cache, "b", 10)
+    # Loading marks a as used, so b is now the least recently used one
+    assert cache.load("a") is not None
+    _store(cache, "c")
+    assert cache.load("b") is None
+    assert cache.load("a") is not None
+    assert cache.load("c") is not None
+    assert cache.size_bytes() <= cache.max_bytes
+
+
+def test_entry_larger_than_the_cache_is_kept(tmp_path):
+    cache = IndexCache(tmp_path, max_bytes=1)
+    _store(cache, "a")
+    assert cache.load("a") is not None
+
+
+@pytest.mark.parametrize("damage", ["truncate_index", "garble_chunks", "drop_chunks"])
+def test_corrupt_entry_is_dropped(tmp_path, damage):
+    cache = IndexCache(tmp_path)
+    _store(cache, "a")
+    entry = tmp_path / "a"
+    if damage == "truncate_index":
+        index_file = entry / IndexCache.INDEX_FILE
+        index_file.write_bytes(index_file.read_bytes()[:64])
+    elif damage == "garble_chunks":
+        (entry / IndexCache.CHUNKS_FILE).write_text("[not json", encoding='utf-8')
+    else:
+        # Fewer chunks than vectors
+        (entry / IndexCache.CHUNKS_FILE).write_text('["only one"]', encoding='utf-8')
+    assert cache.load("a") is None
+    assert not entry.exists()
+
+
+def test_store_invalidates_other_versions_of_the_source(tmp_path):
+    cache = IndexCache(tmp_path)
+    index = faiss.IndexFlatL2(4)
+    cache.store("v1", index, [], {"source": "doc.pdf", "document_hash": "1"})
+    cache.store("v2", index, [], {"source": "doc.pdf", "document_hash": "2"})
+    assert cache.load("v1") is None
+    assert cache.load("v2") is not None
+
+
+def test_entry_of_an_older_format_is_dropped(tmp_path):
+    cache = IndexCache(tmp_path)
+    _store(cache, "a")
+    meta_file = tmp_path / "a" / IndexCache.META_FILE
+    meta = json.loads(meta_file.read_text(encoding='utf-8'))
+    meta_file.write_text(json.dumps({**meta, "version": IndexCache.FORMAT_VERSION - 1}), encoding='utf-8')
+    assert cache.load("a") is None
+    assert not (tmp_path / "a").exists()
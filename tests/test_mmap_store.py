@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from retrievers.mmap_store import MmapEmbeddings, MmapStore, StorageMode  # noqa: E402
+
+
+def _embeddings(count: int = 2000, dimension: int = 32) -> np.ndarray:
+    return np.random.default_rng(0).standard_normal((count, dimension)).astype('float32')
+
+
+def _write(store: MmapStore, embeddings: np.ndarray, mode: StorageMode):
+    chunks = [f"chunk {i}" for i in range(len(embeddings))]
+    return store.write("key", embeddings, chunks, mode, {"pages": np.ones(len(chunks), dtype='int64')},
+                       {"source": "doc.pdf"})
+
+
+@pytest.mark.parametrize("mode, min_recall", [(StorageMode.FLOAT16, 1.0), (StorageMode.INT8, 0.9)])
+def test_mapped_search_matches_flat_search(tmp_path, mode, min_recall):
+    embeddings = _embeddings()
+    queries = embeddings[:20] + 0.1 * _embeddings(20)
+    flat = faiss.IndexFlatL2(embeddings.shape[1])
+    flat.add(embeddings)
+    _, expected = flat.search(queries, 10)
+
+    entry = _write(MmapStore(tmp_path), embeddings, mode)
+    _, found = entry.embeddings.search(queries, 10)
+    recall = np.mean([len(set(row) & set(expected_row)) / 10 for row, expected_row in zip(found, expected)])
+    assert recall >= min_recall
+    assert entry.embeddings.reconstruct_batch(np.arange(3)) == pytest.approx(embeddings[:3], abs=0.1)
+
+
+def test_mapped_search_pads_missing_hits(tmp_path):
+    entry = _write(MmapStore(tmp_path), _embeddings(3), StorageMode.INT8)
+    distances, ids = entry.embeddings.search(_embeddings(1), 5)
+    assert list(ids[0, 3:]) == [-1, -1]
+    assert sorted(ids[0, :3]) == [0, 1, 2]
+
+
+@pytest.mark.parametrize("corrupt", ["truncate", "delete"])
+def test_corrupt_entry_is_dropped(tmp_path, corrupt):
+    store = MmapStore(tmp_path)
+    _write(store, _embeddings(100), StorageMode.FLOAT16)
+    index_path = tmp_path / "key" / MmapEmbeddings.INDEX_FILE
+    if corrupt == "truncate":
+        index_path.write_bytes(index_path.read_bytes()[:100])
+    else:
+        index_path.unlink()
+    assert store.open("key") is None
+    assert not (tmp_path / "key").exists()
+    assert store.open("key") is None
@@ -0,0 +1,66 @@
+import pytest
+
+from utils.paged_text_file import PagedTextFile, line_offsets
+
+LINES = ["alpha beta", "", "gamma alpha", "délta", "alpha alpha", "omega"]
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    def make(content: bytes, name: str = "lines.txt"):
+        path = tmp_path / name
+        path.write_bytes(content)
+        return path
+    return make
+
+
+@pytest.mark.parametrize("trailing_newline", [True, False])
+@pytest.mark.parametrize("block_size", [1, 4, 1 << 24])
+def test_line_offsets_delimit_every_line(text_file, trailing_newline, block_size):
+    content = "\n".join(LINES).encode('utf-8') + (b"\n" if trailing_newline else b"")
+    offsets = line_offsets(text_file(content), block_size)
+    assert len(offsets) == len(LINES) + 1
+    assert offsets[-1] == len(content)
+    for i, line in enumerate(LINES):
+        assert content[offsets[i]:offsets[i + 1]].rstrip(b"\n").decode('utf-8') == line
+
+
+@pytest.mark.parametrize("content, expected", [(b"", [0]), (b"\n", [0, 1]), (b"only line", [0, 9])])
+def test_line_offsets_of_tiny_files(text_file, content, expected):
+    assert list(line_offsets(text_file(content))) == expected
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_lines_reads_line_ranges(text_file, newline, trailing_newline):
+    content = newline.join(LINES) + (newline if trailing_newline else "")
+    with PagedTextFile(text_file(content.encode('utf-8'))) as paged:
+        assert len(paged) == len(LINES)
+        assert paged.lines(0, len(paged)) == newline.join(LINES)
+        assert paged.lines(2, 4) == f"gamma alpha{newline}délta"
+        assert paged.lines(5, 6) == "omega"
+        # Ranges are clipped to the file
+        assert paged.lines(-3, 1) == "alpha beta"
+        assert paged.lines(4, 100) == f"alpha alpha{newline}omega"
+        assert paged.lines(6, 10) == ""
+        assert paged.lines(3, 3) == ""
+
+
+def test_search_finds_each_matching_line_once(text_file):
+    with PagedTextFile(text_file(("\n".join(LINES)).encode('utf-8'))) as paged:
+        assert paged.search("alpha") == [0, 2, 4]
+        assert paged.search("alpha", start_line=1) == [2, 4]
+        assert paged.search("alpha", limit=2) == [0, 2]
+        assert paged.search("délta") == [3]
+        assert paged.search("omega") == [5]
+        assert paged.search("Alpha") == []
+        assert paged.search("") == []
+        assert paged.search("alpha", start_line=len(paged)) == []
+        assert paged.line_of(paged.offsets[3]) == 3
+
+
+def test_empty_file(text_file):
+    with PagedTextFile(text_file(b"")) as paged:
+        assert len(paged) == 0
+        assert paged.lines(0, 10) == ""
+        assert paged.search("alpha") == []
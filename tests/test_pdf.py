@@ -0,0 +1,64 @@
+import pytest
+
+from artifacts.pdf import Pdf
+
+PAGES = [f"Page {i} reports revenue of {i * 100} EUR." if i % 7 else "" for i in range(1, 22)]
+
+
+class CountingBackend:
+    # Records which pages the wrapped backend extracts
+    def __init__(self, backend):
+        self.backend = backend
+        self.extracted = []
+
+    def page_count(self):
+        return self.backend.page_count()
+
+    def extract_page(self, page_num):
+        self.extracted.append(page_num)
+        return self.backend.extract_page(page_num)
+
+
+def counting(pdf: Pdf) -> CountingBackend:
+    pdf._backend = CountingBackend(pdf.backend)
+    return pdf._backend
+
+
+@pytest.mark.parametrize("backend", ["pymupdf", "pypdf"])
+def test_parallel_extraction_matches_sequential(make_pdf, backend):
+    pytest.importorskip(backend)
+    path = make_pdf(PAGES)
+    sequential = Pdf(path, backend, workers=1)
+    parallel = Pdf(path, backend, workers=2)
+    assert len(PAGES) > Pdf.MIN_PAGES_PER_TASK
+    assert parallel.get_text() == sequential.get_text()
+    assert parallel.pages == sequential.pages
+    assert "Page 20 reports revenue of 2000 EUR." in parallel.pages[19]
+    # A subset is extracted in parallel too and lands on the right pages
+    pages = list(range(2, 22, 2))
+    assert Pdf(path, backend, workers=2).get_text(pages) == Pdf(path, backend).get_text(pages)
+
+
+def test_lazy_access_extracts_only_the_requested_pages(make_pdf):
+    pdf = Pdf(make_pdf(PAGES), lazy=True)
+    backend = counting(pdf)
+    assert "Page 3 " in pdf.get_page_text(3)
+    assert "Page 5 " in pdf.get_page_text(5)
+    assert pdf.get_page_text(3) == pdf.pages[2]
+    assert backend.extracted == [2, 4]
+    # get_text reuses what was extracted lazily
+    pdf.get_text([3, 4])
+    assert backend.extracted == [2, 4, 3]
+
+
+def test_extracted_empty_page_is_returned(make_pdf):
+    pdf = Pdf(make_pdf(PAGES))
+    with pytest.raises(ValueError):
+        pdf.get_page_text(7)
+    pdf.get_text([6, 7])
+    assert pdf.get_page_text(7).strip() == ""
+    assert "Page 6 " in pdf.get_page_text(6)
+    with pytest.raises(ValueError):
+        pdf.get_page_text(8)
+    with pytest.raises(ValueError):
+        pdf.get_page_text(len(PAGES) + 1)
@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import List
+
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+from artifacts.pdf import Pdf  # noqa: E402
+from chat.answer_cache import SemanticAnswerCache  # noqa: E402
+from chat.context_builder import ContextBuilder  # noqa: E402
+from chat.rag_chat import RagChat  # noqa: E402
+from retrievers.faiss_retriever import FaissRetriever, load_embedding_model  # noqa: E402
+
+PAGES = ["Revenue grew strongly in Europe and Asia.\nThe board proposed a dividend.",
+         "Loans payable carry covenants on liquidity.\nGoodwill impairment was recognised."]
+
+
+def make_chat(retriever: FaissRetriever) -> RagChat:
+    return RagChat(retriever, model=FakeListChatModel(responses=["stub answer"]),
+                   context_builder=ContextBuilder(retriever, lambda texts: [len(t.split()) for t in texts], 500))
+
+
+@pytest.mark.parametrize("mode, encodes", [("lexical", False), ("dense", True), ("hybrid", True)])
+def test_lexical_mode_skips_embedding_model(make_pdf, encoder_name, monkeypatch, mode, encodes):
+    retriever = FaissRetriever(Pdf(make_pdf(PAGES)), encoder_name, retrieval_mode=mode)
+    encoded = []
+    encoder = load_embedding_model(encoder_name)
+    original = encoder.encode
+    monkeypatch.setattr(encoder, "encode", lambda texts, **kwargs: encoded.append(texts) or original(texts))
+
+    chat = make_chat(retriever)
+    assert chat.ask("Which covenants apply?") == "stub answer"
+    assert chat.ask_many(["dividend?", "goodwill?"]) == ["stub answer", "stub answer"]
+    assert "dividend" in chat.last_contexts[0].text
+    assert bool(encoded) == encodes
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("429 Too Many Requests")
+        self.response = type("Response", (), {"headers": {"retry-after": str(retry_after)}})()
+
+
+class TrackingChain:
+    """
+    Wraps the chat's chain: counts the calls in flight, finishes later questions first and can fail
+    the first calls with a 429.
+    """
+
+    def __init__(self, chain, rate_limited_calls: int = 0):
+        self.chain = chain
+        self.rate_limited_calls = rate_limited_calls
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ainvoke(self, inputs: dict) -> str:
+        self.calls += 1
+        if self.rate_limited_calls:
+            self.rate_limited_calls -= 1
+            raise RateLimitError(retry_after=0.05)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            answer = await self.chain.ainvoke(inputs)
+            await asyncio.sleep(0.02 / (1 + int(inputs["QUERY"].split()[-1])))
+            return f"{answer} to {inputs['QUERY']}"
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.mark.parametrize("concurrency", [1, 3])
+def test_aask_many_answers_in_order_with_bounded_concurrency(make_pdf, encoder_name, concurrency):
+    chat = make_chat(FaissRetriever(Pdf(make_pdf(PAGES)), encoder_name))
+    chat.chain = tracking = TrackingChain(chat.chain)
+    questions: List[str] = [f"dividend question {i}" for i in range(8)]
+    answers = asyncio.run(chat.aask_many(questions, concurrency=concurrency))
+    assert answers == [f"stub answer to {question}" for question in questions]
+    assert tracking.max_in_flight == concurrency
+    assert asyncio.run(chat.aask("dividend question 9")) == "stub answer to dividend question 9"
+
+
+def test_rate_limited_request_is_retried_and_penalizes_the_limiter(make_pdf, encoder_name, monkeypatch):
+    chat = make_chat(FaissRetriever(Pdf(make_pdf(PAGES)), encoder_name))
+    chat.chain = tracking = TrackingChain(chat.chain, rate_limited_calls=1)
+    penalties = []
+    penalize = chat.rate_limiter.penalize
+    monkeypatch.setattr(chat.rate_limiter, "penalize", lambda seconds: penalties.append(seconds) or penalize(seconds))
+    start = time.monotonic()
+    answers = asyncio.run(chat.aask_many(["goodwill question 0", "goodwill question 1"], concurrency=2))
+    assert answers == ["stub answer to goodwill question 0", "stub answer to goodwill question 1"]
+    assert tracking.calls == 3
+    assert penalties == [0.05]
+    # The retry waited for the Retry-After the server asked for
+    assert time.monotonic() - start >= 0.05
+
+
+def test_ask_stream_yields_the_answer_and_records_stats(make_pdf, encoder_name):
+    chat = make_chat(FaissRetriever(Pdf(make_pdf(PAGES)), encoder_name))
+    pieces = list(chat.ask_stream("Which covenants apply?"))
+    assert len(pieces) > 1
+    assert "".join(pieces) == "stub answer"
+    stats = chat.last_stats
+    assert stats is chat.stats_history[-1]
+    assert stats.tokens == len(pieces)
+    assert 0 <= stats.time_to_first_token <= stats.total_seconds
+    assert stats.tokens_per_second is None or stats.tokens_per_second > 0
+    assert "covenants" in chat.last_contexts[0].text
+
+
+def test_ask_stream_cache_hit_yields_the_cached_answer(make_pdf, encoder_name):
+    retriever = FaissRetriever(Pdf(make_pdf(PAGES)), encoder_name)
+    chat = RagChat(retriever, model=FakeListChatModel(responses=["first answer", "second answer"]),
+                   answer_cache=SemanticAnswerCache(),
+                   context_builder=ContextBuilder(retriever, lambda texts: [len(t.split()) for t in texts], 500))
+    assert "".join(chat.ask_stream("Is a dividend proposed?")) == "first answer"
+    # The streamed answer was cached, so the model is not asked again
+    assert list(chat.ask_stream("Is a dividend proposed?")) == ["first answer"]
+    assert chat.last_stats.tokens == 1
+    assert chat.last_stats.total_seconds is not None
+    assert len(chat.stats_history) == 2
+    assert chat.answer_cache.hits == 1
+
+
+def test_local_ask_stream_cache_hit_does_not_load_the_model(make_pdf, encoder_name):
+    from chat.local_rag_chat import LocalRagChat
+
+    retriever = FaissRetriever(Pdf(make_pdf(PAGES)), encoder_name)
+    chat = LocalRagChat(retriever, answer_cache=SemanticAnswerCache(),
+                        context_builder=ContextBuilder(retriever, lambda texts: [len(t.split()) for t in texts], 500))
+    chat._cache_answers(["Is a dividend proposed?"], chat._encode(["Is a dividend proposed?"]), ["cached answer"])
+    assert list(chat.ask_stream("Is a dividend proposed?")) == ["cached answer"]
+    assert chat.last_stats.tokens == 1
+    assert chat._local_model is None
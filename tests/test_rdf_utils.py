@@ -0,0 +1,181 @@
+import gc
+import json
+import sys
+
+import pytest
+
+rdflib = pytest.importorskip("rdflib")
+from rdflib import OWL, RDF, RDFS, Literal, Namespace  # noqa: E402
+
+from utils import rdf_utils  # noqa: E402
+
+EX = Namespace("http://example.org/")
+
+
+def ontology(*triples):
+    graph = rdflib.Graph()
+    for triple in triples:
+        graph.add(triple)
+    return graph
+
+
+def test_ontology_index_is_per_graph_object():
+    # Graphs with the same identifier compare equal in rdflib, their indexes must not be shared
+    first = rdflib.Graph(identifier=EX.g)
+    first.add((EX.A, RDF.type, OWL.Class))
+    second = rdflib.Graph(identifier=EX.g)
+    second.add((EX.B, RDF.type, OWL.Class))
+    assert rdf_utils.create_ontology_summary_dict(first)["Classes"] == [str(EX.A)]
+    assert rdf_utils.create_ontology_summary_dict(second)["Classes"] == [str(EX.B)]
+
+
+def test_ontology_index_rebuilt_when_triples_change():
+    graph = ontology((EX.A, RDF.type, OWL.Class), (EX.B, RDF.type, OWL.Class), (EX.B, RDFS.subClassOf, EX.A))
+    assert rdf_utils.ontology_index(graph).class_hierarchy() == {EX.A: {EX.B: {}}}
+    graph.remove((EX.B, RDFS.subClassOf, EX.A))
+    assert rdf_utils.ontology_index(graph).class_hierarchy() == {EX.A: {}, EX.B: {}}
+    # Replacing a triple keeps the size, which the cache only notices after invalidate_graph
+    graph.add((EX.A, RDFS.subClassOf, EX.B))
+    graph.remove((EX.A, RDF.type, OWL.Class))
+    graph.add((EX.C, RDF.type, OWL.Class))
+    rdf_utils.invalidate_graph(graph)
+    assert rdf_utils.ontology_index(graph).class_hierarchy() == {EX.B: {EX.A: {}}, EX.C: {}}
+
+
+class CountingGraph(rdflib.Graph):
+    iterations = 0
+
+    def __iter__(self):
+        CountingGraph.iterations += 1
+        return super().__iter__()
+
+
+def test_cache_hit_does_not_walk_the_triples():
+    graph = CountingGraph()
+    graph.add((EX.A, RDF.type, OWL.Class))
+    rdf_utils.ontology_index(graph)
+    rdf_utils.rdf_networkx_graph(graph)
+    walked = CountingGraph.iterations
+    assert walked >= 2
+    for _ in range(3):
+        rdf_utils.ontology_index(graph)
+        rdf_utils.rdf_networkx_graph(graph)
+    assert CountingGraph.iterations == walked
+
+
+def test_ontology_index_reused_and_released():
+    graph = ontology((EX.A, RDF.type, OWL.Class))
+    assert rdf_utils.ontology_index(graph) is rdf_utils.ontology_index(graph)
+    entries = rdf_utils._ontology_indexes._entries
+    key = id(graph)
+    assert key in entries
+    del graph
+    gc.collect()
+    assert key not in entries
+
+
+def test_networkx_graph_is_per_graph_object_and_content():
+    first = rdflib.Graph(identifier=EX.g)
+    first.add((EX.a, EX.knows, EX.b))
+    second = rdflib.Graph(identifier=EX.g)
+    second.add((EX.c, EX.knows, EX.d))
+    assert set(rdf_utils.rdf_networkx_graph(first).nodes) == {EX.a, EX.b}
+    assert set(rdf_utils.rdf_networkx_graph(second).nodes) == {EX.c, EX.d}
+    second.remove((EX.c, EX.knows, EX.d))
+    second.add((EX.c, EX.knows, EX.e))
+    rdf_utils.invalidate_graph(second)
+    assert set(rdf_utils.rdf_networkx_graph(second).edges) == {(EX.c, EX.e)}
+    second.add((EX.e, EX.knows, EX.f))
+    assert set(rdf_utils.rdf_networkx_graph(second).edges) == {(EX.c, EX.e), (EX.e, EX.f)}
+
+
+def star_graph(leaves):
+    # EX.hub points at every leaf, EX.leaf0 has one neighbour of its own
+    graph = rdflib.Graph()
+    for i in range(leaves):
+        graph.add((EX.hub, EX.knows, EX[f"leaf{i}"]))
+    graph.add((EX.leaf0, EX.knows, EX.far))
+    return rdf_utils.rdf_networkx_graph(graph)
+
+
+def test_sample_graph_keeps_the_neighbourhood_and_the_best_connected_nodes():
+    nx_graph = star_graph(10)
+    assert rdf_utils.sample_graph(nx_graph) is nx_graph
+    # Edge direction is ignored, the focus may be given as a string
+    assert set(rdf_utils.sample_graph(nx_graph, str(EX.far)).nodes) == {EX.far, EX.leaf0}
+    assert set(rdf_utils.sample_graph(nx_graph, EX.far, hops=2).nodes) == {EX.far, EX.leaf0, EX.hub}
+    assert set(rdf_utils.sample_graph(nx_graph, max_nodes=2).nodes) == {EX.hub, EX.leaf0}
+    # The focus is kept even though its degree is the lowest
+    assert set(rdf_utils.sample_graph(nx_graph, EX.far, hops=3, max_nodes=2).nodes) == {EX.hub, EX.far}
+    with pytest.raises(ValueError):
+        rdf_utils.sample_graph(nx_graph, EX.missing)
+
+
+def test_default_sample_of_a_large_graph_gets_the_spectral_layout(monkeypatch):
+    networkx = pytest.importorskip("networkx")
+    assert rdf_utils.SPRING_LAYOUT_MAX_NODES < rdf_utils.VISUALIZATION_MAX_NODES
+    used = []
+    for name in ("spring_layout", "spectral_layout"):
+        layout = getattr(networkx, name)
+        monkeypatch.setattr(networkx, name, lambda g, *args, _name=name, _layout=layout, **kwargs:
+                            used.append(_name) or _layout(g, *args, **kwargs))
+    monkeypatch.setattr(rdf_utils, "_layout_cache", rdf_utils.OrderedDict())
+
+    small = rdf_utils.sample_graph(star_graph(10), max_nodes=rdf_utils.VISUALIZATION_MAX_NODES)
+    large = rdf_utils.sample_graph(star_graph(300), max_nodes=rdf_utils.VISUALIZATION_MAX_NODES)
+    assert large.number_of_nodes() == rdf_utils.VISUALIZATION_MAX_NODES
+    assert set(rdf_utils.graph_layout(small)) == set(small.nodes)
+    assert set(rdf_utils.graph_layout(large)) == set(large.nodes)
+    assert used == ["spring_layout", "spectral_layout"]
+    # Positions of a graph already laid out come from the cache
+    rdf_utils.graph_layout(large)
+    assert len(used) == 2
+
+
+def test_ontology_index_subclass_tree_and_cycles():
+    graph = ontology((EX.A, RDF.type, OWL.Class), (EX.B, RDFS.subClassOf, EX.A), (EX.C, RDFS.subClassOf, EX.B),
+                     (EX.A, RDFS.subClassOf, EX.C), (EX.D, RDF.type, OWL.Class), (EX.p, RDFS.subPropertyOf, EX.q))
+    index = rdf_utils.ontology_index(graph)
+    # The subClassOf cycle stops at the class already on the path
+    assert index.subclass_tree(EX.A) == {EX.B: {EX.C: {}}}
+    assert index.class_hierarchy() == {EX.D: {}}
+    assert index.of_type(OWL.Class) == {EX.A, EX.D}
+    assert index.superproperties == {EX.p: [EX.q]}
+
+
+def people():
+    return ontology((EX.alice, EX.knows, EX.bob), (EX.bob, EX.knows, EX.alice), (EX.alice, EX.name, Literal("Alice")),
+                    (EX.bob, EX.name, Literal("Bob")))
+
+
+def test_rdf_to_json_hierarchy_expands_once_and_refers_back():
+    tree = rdf_utils.rdf_to_json_hierarchy(people(), EX.alice)
+    assert tree == {"subject": str(EX.alice), "properties": {
+        str(EX.knows): [{"subject": str(EX.bob), "properties": {
+            str(EX.knows): [{"ref": str(EX.alice)}],
+            str(EX.name): ["Bob"]}}],
+        str(EX.name): ["Alice"]}}
+
+
+def test_rdf_to_json_hierarchy_handles_chains_deeper_than_the_recursion_limit():
+    depth = sys.getrecursionlimit() + 100
+    graph = ontology(*((EX[f"n{i}"], EX.next, EX[f"n{i + 1}"]) for i in range(depth)))
+    node, hops = rdf_utils.rdf_to_json_hierarchy(graph, EX.n0), 0
+    while node["properties"]:
+        node, hops = node["properties"][str(EX.next)][0], hops + 1
+    assert hops == depth
+    assert node["subject"] == str(EX[f"n{depth}"])
+
+
+def test_convert_rdf_to_json_one_entry_per_subject(tmp_path):
+    graph = people()
+    entries = rdf_utils.convert_rdf_to_json(graph)
+    by_subject = {entry["subject"]: entry["properties"] for entry in entries}
+    assert len(entries) == len(by_subject) == 2
+    assert by_subject[str(EX.alice)] == {str(EX.knows): [{"ref": str(EX.bob)}], str(EX.name): ["Alice"]}
+
+    output_path = tmp_path / "graph.json"
+    assert rdf_utils.convert_rdf_to_json(graph, output_path) == 2
+    assert json.loads(output_path.read_text(encoding='utf-8')) == entries
+    assert rdf_utils.convert_rdf_to_json(rdflib.Graph(), output_path) == 0
+    assert json.loads(output_path.read_text(encoding='utf-8')) == []
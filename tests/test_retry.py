@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.rate_limiter import AsyncRateLimiter
+from utils.retry import async_retry_on_rate_limit
+
+
+class RateLimitError(Exception):
+    pass
+
+
+def test_rate_limiter_spaces_out_requests():
+    limiter = AsyncRateLimiter(requests_per_minute=1200)
+
+    async def main():
+        start = time.monotonic()
+        for _ in range(4):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    # The first request starts at once, the next three each wait 50 ms
+    assert asyncio.run(main()) >= 0.14
+
+
+def test_penalty_delays_the_next_request():
+    limiter = AsyncRateLimiter()
+
+    async def main():
+        limiter.penalize(0.05)
+        start = time.monotonic()
+        await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) >= 0.04
+
+
+def test_retry_backs_off_and_gives_up():
+    calls = []
+
+    async def call():
+        calls.append(time.monotonic())
+        raise RateLimitError("slow down")
+
+    with pytest.raises(RateLimitError):
+        asyncio.run(async_retry_on_rate_limit(call, retries=2, base_delay=0.01))
+    assert len(calls) == 3
+    assert calls[2] - calls[1] >= calls[1] - calls[0] >= 0.01
+
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    async def call():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(async_retry_on_rate_limit(call, limiter=AsyncRateLimiter()))
+    assert len(calls) == 1
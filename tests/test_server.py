@@ -0,0 +1,102 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from server import MicroBatcher
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_concurrent_questions_are_answered_in_batches():
+    batches: List[List[str]] = []
+
+    async def answer_many(questions: List[str]) -> List[str]:
+        batches.append(questions)
+        await asyncio.sleep(0)
+        return [question.upper() for question in questions]
+
+    async def main():
+        batcher = MicroBatcher(answer_many, max_batch_size=4, batch_window=0.05)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.ask(f"q{i}") for i in range(10))), batcher.stats
+        finally:
+            await batcher.stop()
+
+    answers, stats = run(main())
+    assert answers == [f"Q{i}" for i in range(10)]
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert sum(batches, []) == [f"q{i}" for i in range(10)]
+    assert (stats.requests, stats.batches, stats.mean_batch_size) == (10, 3, 10 / 3)
+
+
+def test_batch_window_bounds_the_wait():
+    async def answer_many(questions: List[str]) -> List[str]:
+        return questions
+
+    async def main():
+        batcher = MicroBatcher(answer_many, max_batch_size=16, batch_window=0.01)
+        batcher.start()
+        try:
+            first = await batcher.ask("a")
+            await asyncio.sleep(0.05)
+            second = await batcher.ask("b")
+            return first, second, batcher.stats
+        finally:
+            await batcher.stop()
+
+    first, second, stats = run(main())
+    assert (first, second) == ("a", "b")
+    assert dict(stats.batch_sizes) == {1: 2}
+
+
+def test_a_failing_batch_fails_its_questions_only():
+    async def answer_many(questions: List[str]) -> List[str]:
+        if "bad" in questions:
+            raise ValueError("model crashed")
+        return questions
+
+    async def main():
+        batcher = MicroBatcher(answer_many, max_batch_size=2, batch_window=0.05)
+        batcher.start()
+        try:
+            results = await asyncio.gather(batcher.ask("bad"), batcher.ask("x"), batcher.ask("good"),
+                                           return_exceptions=True)
+            return results, batcher.stats
+        finally:
+            await batcher.stop()
+
+    results, stats = run(main())
+    assert [type(result) for result in results[:2]] == [ValueError, ValueError]
+    assert results[2] == "good"
+    assert (stats.batches, stats.errors) == (2, 1)
+
+
+def test_full_queue_makes_enqueue_wait():
+    release = None
+
+    async def answer_many(questions: List[str]) -> List[str]:
+        await release.wait()
+        return questions
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        batcher = MicroBatcher(answer_many, max_batch_size=1, batch_window=0, max_queue_size=1)
+        batcher.start()
+        try:
+            # One question is being answered, one waits in the queue
+            first = await batcher.enqueue("a")
+            await asyncio.sleep(0.01)
+            await batcher.enqueue("b")
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(batcher.enqueue("c"), 0.05)
+            release.set()
+            return await first
+        finally:
+            await batcher.stop()
+
+    assert run(main()) == "a"
@@ -0,0 +1,54 @@
+import pytest
+
+from config import ConfigManager
+from utils.tracing import Tracer, prometheus_text, traced
+
+
+@pytest.fixture
+def tracer():
+    tracer = Tracer()
+    tracer.reset()
+    yield tracer
+    ConfigManager().configure({"tracing_enabled": False})
+    tracer._enabled = None
+    tracer.sinks.clear()
+    tracer.reset()
+
+
+@traced("test.sum")
+def traced_sum(*values):
+    return sum(values)
+
+
+@traced("test.stream")
+def traced_stream(count):
+    yield from range(count)
+
+
+def test_config_flag_is_read_after_import(tracer):
+    traced_sum(1, 2)
+    assert tracer.snapshot()["histograms"] == {}
+    ConfigManager().configure({"tracing_enabled": True})
+    assert traced_sum(1, 2) == 3
+    assert tracer.snapshot()["histograms"]["test.sum.seconds"]["count"] == 1
+    tracer.disable()
+    traced_sum(1, 2)
+    assert tracer.snapshot()["histograms"]["test.sum.seconds"]["count"] == 1
+
+
+def test_generator_span_covers_the_whole_stream(tracer):
+    tracer.enable()
+    assert list(traced_stream(3)) == [0, 1, 2]
+    assert tracer.snapshot()["histograms"]["test.stream.seconds"]["count"] == 1
+
+
+def test_prometheus_histogram_is_cumulative(tracer):
+    tracer.enable()
+    for value in (1, 3, 3, 50000):
+        tracer.observe("test.size", value, buckets=(2, 5))
+    tracer.count("test.calls", 2)
+    text = prometheus_text(tracer.snapshot(), prefix="rag_")
+    assert 'rag_test_size_bucket{le="2"} 1' in text
+    assert 'rag_test_size_bucket{le="5"} 3' in text
+    assert 'rag_test_size_bucket{le="+Inf"} 4' in text
+    assert "rag_test_calls_total 2" in text